@@ -0,0 +1,321 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+from main import SIMULATION_STEP
+
+# Like exporter.py, OpenGL is only imported after PYOPENGL_PLATFORM is set.
+
+EJECTA_BENCHMARK_COUNT = 100000
+CLOUD_BENCHMARK_COUNT = 500000
+# --check fails if any measured allocation run keeps or peaks above these (bytes).
+# The peak includes what PyOpenGL's wrappers allocate and free within a frame.
+ALLOCATION_NET_LIMIT = 256
+ALLOCATION_PEAK_LIMIT = 2048
+
+def timed(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples), "repeats": repeats}
+
+def band_mass(range_data):
+    low, high = range_data["range"]
+    return math.sqrt(low * high)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_updates(seed, repeats):
+    from exporter import make_simulation
+    from simulation import MASS_RANGES, cloud_cache
+    results = {}
+    for range_name, range_data in MASS_RANGES.items():
+        timeline = make_simulation(band_mass(range_data)).mass_controller.get_timeline()
+        ticks = math.ceil((timeline.stage_starts[-1] + 2.0) / SIMULATION_STEP)
+
+        def run():
+            # Include cloud generation in every run
+            cloud_cache.clear()
+            simulation = make_simulation(band_mass(range_data), seed=seed)
+            for _ in range(ticks):
+                simulation.step(SIMULATION_STEP)
+
+        timing = timed(run, repeats)
+        timing["ticks"] = ticks
+        timing["ticks_per_second"] = ticks / (timing["min_ms"] / 1000)
+        results[range_name] = timing
+    return results
+
+def benchmark_particles(seed, repeats):
+    from concurrent.futures import ProcessPoolExecutor
+    from simulation import MASS_RANGES, EjectaSystem, ParticleSystem, cloud_entropy, generate_cloud
+    results = {}
+    clouds = {(stage["particle_count"], stage["particle_spread"])
+              for range_data in MASS_RANGES.values() for stage in range_data["stages"] if "particle_count" in stage}
+    for count, spread in sorted(clouds):
+        particles = ParticleSystem()
+
+        def spawn():
+            particles.spawn(count, spread, np.random.default_rng(seed))
+
+        results[f"spawn_{count}"] = timed(spawn, repeats)
+        # Stepping only advances the age; the per-particle cost is computing rotations for a frame
+        results[f"rotations_{count}"] = timed(lambda: particles.interpolated_rotations(SIMULATION_STEP / 2), repeats)
+
+    ejecta = EjectaSystem()
+    for count in (2000, EJECTA_BENCHMARK_COUNT):
+        results[f"ejecta_spawn_{count}"] = timed(lambda: ejecta.spawn(count, 6.0, 5.0, np.random.default_rng(seed)), repeats)
+        results[f"ejecta_update_{count}"] = timed(lambda: ejecta.update(SIMULATION_STEP), repeats)
+
+    entropy = cloud_entropy(seed, "benchmark", "cloud")
+    results[f"cloud_{CLOUD_BENCHMARK_COUNT}_serial"] = timed(lambda: generate_cloud(CLOUD_BENCHMARK_COUNT, 3.5, entropy), repeats)
+    with ProcessPoolExecutor() as executor:
+        generate_cloud(CLOUD_BENCHMARK_COUNT, 3.5, entropy, executor)  # start the workers
+        results[f"cloud_{CLOUD_BENCHMARK_COUNT}_pool"] = timed(
+            lambda: generate_cloud(CLOUD_BENCHMARK_COUNT, 3.5, entropy, executor), repeats)
+    return results
+
+def benchmark_light_map(seed, repeats):
+    from textures import generate_light_map, light_map_cache
+
+    def generate():
+        light_map_cache.clear()
+        generate_light_map(256, seed)
+
+    return timed(generate, repeats)
+
+def benchmark_hud(repeats):
+    import pygame
+    from hud import HUDRenderer, HUDText
+    from simulation import MASS_RANGES, MassController
+    pygame.font.init()
+    hud = HUDRenderer(800, 600)
+    mass_controller = MassController()
+    stages = [stage for range_data in MASS_RANGES.values() for stage in range_data["stages"]]
+
+    def layout():
+        for stage in stages:
+            HUDText(hud.atlas, stage["description"], 10, 90, max_width=hud.width - 20)
+
+    def update():
+        for stage in stages:
+            hud.update(stage, 1.0, 1.0, mass_controller)
+            hud.rebuild()
+
+    return {"layout_all_descriptions": timed(layout, repeats), "update_and_rebuild": timed(update, repeats)}
+
+def benchmark_allocations(seed, size, gl_platform, ticks=240):
+    # Traced memory over a run of frames as main draws them (simulation step, HUD
+    # update with the real countdown, then draw_frame: the star surface, nebula
+    # particles and HUD; the starfield and cluster view are not included) that
+    # stays inside one stage or transition, after a warm-up run. Garbage
+    # collection runs once before the warm-up and is then off, like timeit: a full
+    # collection empties CPython's float and tuple free lists, and refilling them
+    # would count as kept memory. The tuple free lists are then filled before
+    # tracing starts, because PyOpenGL's wrappers free more tuples per call than
+    # they take from them and would otherwise refill them a few a frame.
+    width, height = size
+    try:
+        from exporter import OfflineRenderer, make_simulation
+        renderer = OfflineRenderer(width, height, gl_platform)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    import gc
+    import tracemalloc
+    from main import ROTATION_SPEED
+    from star_renderer import draw_frame
+    from simulation import MASS_RANGES
+    hud = renderer.hud
+    results = {}
+    for range_name, range_data in MASS_RANGES.items():
+        simulation = make_simulation(band_mass(range_data), seed=seed)
+        star_renderer = renderer.create_star_renderer(simulation)
+        state = simulation.state
+        timeline = simulation.mass_controller.get_timeline()
+        # Mid-way through the first steady stage and the first transition. Seeking to
+        # a Python float like main's clock; a NumPy scalar would make the countdown
+        # arithmetic allocate NumPy scalars each frame.
+        for phase in (0, 1):
+            simulation.seek(timeline.phase_start_list[phase] + 0.05)
+            phase_ticks = min(ticks, int((timeline.phase_start_list[phase + 1] - simulation.elapsed) / SIMULATION_STEP) // 2)
+
+            def tick():
+                simulation.step(SIMULATION_STEP)
+                hud.update(state.stage, state.time_in_stage, simulation.speed_factor, simulation.mass_controller)
+                draw_frame(star_renderer, hud, simulation.elapsed * ROTATION_SPEED, renderer.zoom, width, height,
+                           None, SIMULATION_STEP / 2)
+
+            gc.collect()
+            gc.disable()
+            # CPython keeps up to 2000 spare tuples of each length below 20
+            spares = [tuple(range(length)) for length in range(1, 20) for _ in range(2000)]
+            del spares
+            tracemalloc.start()
+            for _ in range(phase_ticks):
+                tick()
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            for _ in range(phase_ticks):
+                tick()
+            current, peak = tracemalloc.get_traced_memory()
+            gc.enable()
+            tracemalloc.stop()
+            results[f"{range_name} {'transition' if phase else 'steady'}"] = {
+                "net_bytes": current - start,
+                "peak_bytes": peak - start,
+                "ticks": phase_ticks,
+            }
+    return results
+
+def check_allocations(allocations):
+    if "error" in allocations:
+        return [f"allocations: {allocations['error']}"]
+    failures = []
+    for name, result in sorted(allocations.items()):
+        if result["net_bytes"] > ALLOCATION_NET_LIMIT:
+            failures.append(f"{name}: {result['net_bytes']} bytes kept, limit {ALLOCATION_NET_LIMIT}")
+        if result["peak_bytes"] > ALLOCATION_PEAK_LIMIT:
+            failures.append(f"{name}: {result['peak_bytes']} bytes peak, limit {ALLOCATION_PEAK_LIMIT}")
+    return failures
+
+def benchmark_frames(seed, frames, size, gl_platform):
+    width, height = size
+    try:
+        from exporter import OfflineRenderer, make_simulation
+        renderer = OfflineRenderer(width, height, gl_platform)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+    from star_renderer import draw_frame
+    from simulation import MASS_RANGES
+    results = {"renderer": glGetString(GL_RENDERER).decode(), "size": f"{width}x{height}", "bands": {}}
+    for range_name, range_data in MASS_RANGES.items():
+        simulation = make_simulation(band_mass(range_data), seed=seed)
+        star_renderer = renderer.create_star_renderer(simulation)
+        timeline = simulation.mass_controller.get_timeline()
+        stages = {}
+        for stage_index, stage in enumerate(timeline.stages):
+            duration = timeline.durations[stage_index]
+            simulation.seek(timeline.stage_starts[stage_index] + (duration / 2 if math.isfinite(duration) else 1.0))
+            state = simulation.state
+            renderer.hud.update(state.stage, state.time_in_stage, 1.0, simulation.mass_controller)
+            # Warm up display lists, texture uploads and the HUD atlas
+            draw_frame(star_renderer, renderer.hud, 0.0, renderer.zoom, width, height)
+            glFinish()
+
+            start = time.perf_counter()
+            for frame in range(frames):
+                draw_frame(star_renderer, renderer.hud, frame * 0.5, renderer.zoom, width, height)
+            glFinish()
+            elapsed = time.perf_counter() - start
+            stages[stage["name"]] = {"frames_per_second": frames / elapsed, "frame_ms": elapsed / frames * 1000}
+        results["bands"][range_name] = stages
+    return results
+
+def benchmark_starfield(seed, frames, size, gl_platform):
+    width, height = size
+    try:
+        from exporter import create_context
+        create_context(width, height, gl_platform)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    from OpenGL.GL import glFinish
+    from star_renderer import ZOOM_LEVELS, setup_scene
+    from starfield import STARFIELD_SIZE, StarField
+    results = {}
+    for count in sorted({STARFIELD_SIZE, 1000000}):
+        start = time.perf_counter()
+        starfield = StarField(count, seed)
+        results[f"build_{count}_ms"] = (time.perf_counter() - start) * 1000
+        for zoom in ZOOM_LEVELS:
+            setup_scene(width, height, zoom)
+            starfield.draw(0.0, zoom)  # upload
+            glFinish()
+            start = time.perf_counter()
+            for frame in range(frames):
+                starfield.draw(frame * 0.5, zoom)
+            glFinish()
+            results[f"draw_{count}_zoom_{zoom}_ms"] = (time.perf_counter() - start) / frames * 1000
+    return results
+
+def run_benchmarks(seed=0, repeats=5, frames=30, size=(800, 600), gl_platform="egl", sections=None):
+    sections = sections or ("updates", "particles", "light_map", "hud", "allocations", "frames", "starfield")
+    results = {
+        "seed": seed,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+    if "updates" in sections:
+        results["updates"] = benchmark_updates(seed, repeats)
+    if "particles" in sections:
+        results["particles"] = benchmark_particles(seed, repeats)
+    if "light_map" in sections:
+        results["light_map"] = benchmark_light_map(seed, repeats)
+    if "hud" in sections:
+        results["hud"] = benchmark_hud(repeats)
+    if "allocations" in sections:
+        results["allocations"] = benchmark_allocations(seed, size, gl_platform)
+    if "frames" in sections:
+        results["frames"] = benchmark_frames(seed, frames, size, gl_platform)
+    if "starfield" in sections:
+        results["starfield"] = benchmark_starfield(seed, frames, size, gl_platform)
+    return results
+
+def main():
+    from exporter import parse_size, select_platform
+    parser = argparse.ArgumentParser(description="Benchmark simulation, layout and rendering; results are printed as JSON.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=30, help="frames rendered per stage")
+    parser.add_argument("--size", type=parse_size, default=(800, 600))
+    parser.add_argument("--platform", choices=("egl", "osmesa", "pygame"), default="egl")
+    parser.add_argument("--only", nargs="+", choices=("updates", "particles", "light_map", "hud", "allocations", "frames", "starfield"))
+    parser.add_argument("--out", default=None, help="write JSON here instead of stdout")
+    parser.add_argument("--check", action="store_true",
+                        help=f"run the allocations section and exit non-zero if a run keeps more than "
+                             f"{ALLOCATION_NET_LIMIT} or peaks above {ALLOCATION_PEAK_LIMIT} bytes")
+    args = parser.parse_args()
+    if args.check and args.only and "allocations" not in args.only:
+        args.only.append("allocations")
+
+    # Measure generation, not the on-disk light map cache
+    os.environ.pop("STAR_SIM_CACHE_DIR", None)
+    select_platform(args.platform)
+    if args.platform != "pygame":
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    results = run_benchmarks(args.seed, args.repeats, args.frames, args.size, args.platform, args.only)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.check:
+        failures = check_allocations(results["allocations"])
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import ctypes
+import math
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+
+# OpenGL and the renderer are imported inside the functions below, because
+# PYOPENGL_PLATFORM has to be set before OpenGL is first imported.
+
+def select_platform(platform):
+    # Call before anything imports OpenGL
+    if platform != "pygame":
+        os.environ.setdefault("PYOPENGL_PLATFORM", platform)
+        if platform == "egl":
+            os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+def create_context(width, height, platform):
+    if platform == "egl":
+        from OpenGL import EGL
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        EGL.eglInitialize(display, None, None)
+        attributes = (EGL.EGLint * 9)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_ALPHA_SIZE, 8,
+            EGL.EGL_NONE,
+        )
+        config = EGL.EGLConfig()
+        config_count = EGL.EGLint()
+        EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(config_count))
+        surface = EGL.eglCreatePbufferSurface(display, config, (EGL.EGLint * 5)(
+            EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+        EGL.eglMakeCurrent(display, surface, surface, context)
+        return context
+    if platform == "osmesa":
+        from OpenGL import arrays, osmesa
+        from OpenGL.GL import GL_UNSIGNED_BYTE
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        buffer = arrays.GLubyteArray.zeros((height, width, 4))
+        osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, width, height)
+        return context, buffer
+
+    import pygame
+    from pygame.locals import DOUBLEBUF, HIDDEN, OPENGL
+    pygame.display.init()
+    return pygame.display.set_mode((width, height), DOUBLEBUF | OPENGL | HIDDEN)
+
+class OffscreenTarget:
+    def __init__(self, width, height):
+        from OpenGL.GL import (
+            GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT, GL_DEPTH_COMPONENT24, GL_FRAMEBUFFER,
+            GL_FRAMEBUFFER_COMPLETE, GL_PACK_ALIGNMENT, GL_RENDERBUFFER, GL_RGBA8,
+            glBindFramebuffer, glBindRenderbuffer, glCheckFramebufferStatus, glFramebufferRenderbuffer,
+            glGenFramebuffers, glGenRenderbuffers, glPixelStorei, glRenderbufferStorage, glViewport,
+        )
+        self.width = width
+        self.height = height
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        for attachment, storage in ((GL_COLOR_ATTACHMENT0, GL_RGBA8), (GL_DEPTH_ATTACHMENT, GL_DEPTH_COMPONENT24)):
+            renderbuffer = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, storage, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Offscreen framebuffer is incomplete")
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glViewport(0, 0, width, height)
+
+    def read(self):
+        from OpenGL.GL import GL_RGB, GL_UNSIGNED_BYTE, glReadPixels
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        return np.frombuffer(pixels, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+
+def encode_png(path, pixels, compress_level):
+    Image.fromarray(pixels).save(path, compress_level=compress_level)
+    return path
+
+class FrameWriter:
+    # Frames go through a bounded queue to a writer thread, which either streams
+    # raw RGB24 to one file or hands PNG encoding to a process pool. A full queue
+    # blocks the renderer, so memory stays bounded however fast frames arrive.
+    def __init__(self, output_dir, frame_format="png", workers=None, queue_size=16, compress_level=6):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.frame_format = frame_format
+        self.compress_level = compress_level
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.pool = ProcessPoolExecutor(workers) if frame_format == "png" else None
+        self.max_pending = (workers or os.cpu_count() or 1) * 2
+        self.raw_file = open(os.path.join(output_dir, "frames.rgb"), "wb") if frame_format == "raw" else None
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, name, pixels):
+        if self.error is not None:
+            raise self.error
+        self.frames.put((name, pixels))
+
+    def run(self):
+        # A failure is kept for put() and close() to raise; the queue is still
+        # drained afterwards so neither of them blocks on it
+        pending = deque()
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self.write(item, pending)
+                except Exception as error:
+                    self.error = error
+        if self.error is None:
+            try:
+                for future in pending:
+                    future.result()
+                    self.written += 1
+            except Exception as error:
+                self.error = error
+
+    def write(self, item, pending):
+        name, pixels = item
+        if self.raw_file is not None:
+            self.raw_file.write(np.ascontiguousarray(pixels).tobytes())
+            self.written += 1
+            return
+        path = os.path.join(self.output_dir, f"{name}.png")
+        pending.append(self.pool.submit(encode_png, path, pixels, self.compress_level))
+        while len(pending) > self.max_pending:
+            pending.popleft().result()
+            self.written += 1
+
+    def close(self):
+        self.frames.put(None)
+        self.thread.join()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=self.error is not None)
+        if self.raw_file is not None:
+            self.raw_file.close()
+        if self.error is not None:
+            raise self.error
+
+def slugify(text):
+    return "".join(char if char.isalnum() else "_" for char in text.lower()).strip("_")
+
+class OfflineRenderer:
+    def __init__(self, width, height, platform, zoom=-5.0, hud=True):
+        create_context(width, height, platform)
+        import pygame
+        from star_renderer import setup_scene
+        from hud import HUDRenderer
+        from textures import TextureManager
+
+        pygame.font.init()
+        self.width = width
+        self.height = height
+        self.zoom = zoom
+        self.target = OffscreenTarget(width, height)
+        setup_scene(width, height, zoom)
+        # Textures are only needed if the procedural surface shader is unavailable; they load on first use
+        self.texture_manager = TextureManager()
+        self.hud = HUDRenderer(width, height) if hud else None
+
+    def create_star_renderer(self, simulation):
+        from star_renderer import StarLifeCycleRenderer
+        return StarLifeCycleRenderer(simulation, self.texture_manager)
+
+    def render(self, star_renderer, state, angle):
+        from star_renderer import draw_frame
+        simulation = star_renderer.simulation
+        if self.hud is not None:
+            self.hud.update(state.stage, state.time_in_stage, simulation.speed_factor, simulation.mass_controller)
+        draw_frame(star_renderer, self.hud, angle, self.zoom, self.width, self.height)
+        return self.target.read()
+
+def make_simulation(mass, speed_factor=1.0, seed=0):
+    from simulation import MassController, StarSimulation
+    mass_controller = MassController()
+    mass_controller.current_mass = mass
+    mass_controller.update_mass(0)
+    simulation = StarSimulation(mass_controller, seed)
+    simulation.speed_factor = speed_factor
+    return simulation
+
+def export_sequence(renderer, writer, mass, fps, duration=None, speed_factor=1.0, start=0.0, seed=0):
+    from main import ROTATION_SPEED
+    simulation = make_simulation(mass, speed_factor, seed)
+    star_renderer = renderer.create_star_renderer(simulation)
+    if start:
+        simulation.seek(start)
+
+    if duration is None:
+        timeline = simulation.mass_controller.get_timeline()
+        duration = max(0.0, timeline.stage_starts[-1] + 2.0 - start)
+    frame_time = 1.0 / fps
+    frame_count = math.ceil(duration / (frame_time * speed_factor))
+
+    for frame in range(frame_count):
+        state = simulation.step(frame_time * speed_factor)
+        angle = frame * frame_time * ROTATION_SPEED
+        writer.put(f"frame_{frame:06d}", renderer.render(star_renderer, state, angle))
+    return frame_count
+
+def export_thumbnails(renderer, writer):
+    from simulation import MASS_RANGES
+    count = 0
+    for range_name, range_data in MASS_RANGES.items():
+        low, high = range_data["range"]
+        simulation = make_simulation(math.sqrt(low * high))
+        star_renderer = renderer.create_star_renderer(simulation)
+        timeline = simulation.mass_controller.get_timeline()
+        for stage_index, stage in enumerate(timeline.stages):
+            duration = timeline.durations[stage_index]
+            simulation.seek(timeline.stage_starts[stage_index] + (duration / 2 if math.isfinite(duration) else 1.0))
+            pixels = renderer.render(star_renderer, simulation.state, 30.0)
+            writer.put(f"{slugify(range_name)}_{stage_index:02d}_{slugify(stage['name'])}", pixels)
+            count += 1
+    return count
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the star life cycle offline to a PNG sequence or raw RGB24 video.")
+    parser.add_argument("--mass", type=float, default=1.0, help="star mass in solar masses")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=None, help="simulated seconds to render (default: whole life cycle)")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per video second")
+    parser.add_argument("--start", type=float, default=0.0, help="simulated time to start from")
+    parser.add_argument("--seed", type=int, default=0, help="seed for particle clouds and ejecta")
+    parser.add_argument("--size", type=parse_size, default=(800, 600), help="frame size, e.g. 1280x720")
+    parser.add_argument("--zoom", type=float, default=-5.0)
+    parser.add_argument("--out", default="frames")
+    parser.add_argument("--format", choices=("png", "raw"), default="png")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--platform", choices=("egl", "osmesa", "pygame"), default="egl")
+    parser.add_argument("--no-hud", action="store_true")
+    parser.add_argument("--thumbnails", action="store_true", help="render one still per stage for every mass band")
+    args = parser.parse_args()
+
+    select_platform(args.platform)
+
+    width, height = args.size
+    renderer = OfflineRenderer(width, height, args.platform, args.zoom, hud=not args.no_hud)
+    writer = FrameWriter(args.out, "png" if args.thumbnails else args.format, args.workers, args.queue_size)
+    if args.thumbnails:
+        count = export_thumbnails(renderer, writer)
+    else:
+        count = export_sequence(renderer, writer, args.mass, args.fps, args.duration, args.speed, args.start, args.seed)
+    writer.close()
+
+    print(f"Rendered {count} frames to {args.out}")
+    if args.format == "raw" and not args.thumbnails:
+        print(f"Encode with: ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {args.fps} "
+              f"-i {os.path.join(args.out, 'frames.rgb')} output.mp4")
+
+if __name__ == "__main__":
+    main()
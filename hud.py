@@ -0,0 +1,275 @@
+import math
+import pygame
+from OpenGL.GL import *
+import numpy as np
+
+HUD_FONT_SIZE = 36
+HUD_TEXT_COLOR = (255, 255, 255)
+GLYPH_RANGE = (32, 127)
+ATLAS_WIDTH = 512
+GLYPH_PADDING = 1
+COUNTER_DIGITS = 4  # integer digits of a HUDCounter; larger values show as all nines
+ZERO_CODE = ord("0")
+POINT_CODE = ord(".")
+SPACE_CODE = ord(" ")
+MINUS_CODE = ord("-")
+INFINITY_CODES = tuple(b"inf")
+
+class GlyphAtlas:
+    def __init__(self, font):
+        first, last = GLYPH_RANGE
+        glyphs = [font.render(chr(code), True, HUD_TEXT_COLOR) for code in range(first, last)]
+        height = font.get_height()
+
+        self.advances = np.zeros(256, dtype=np.float32)
+        self.texcoords = np.zeros((256, 4), dtype=np.float32)
+        self.height = height
+
+        positions = []
+        x = y = 0
+        for glyph in glyphs:
+            if x + glyph.get_width() > ATLAS_WIDTH:
+                x = 0
+                y += height + GLYPH_PADDING
+            positions.append((x, y))
+            x += glyph.get_width() + GLYPH_PADDING
+
+        atlas_height = 1
+        while atlas_height < y + height:
+            atlas_height *= 2
+        self.surface = pygame.Surface((ATLAS_WIDTH, atlas_height), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 0))
+
+        for code, glyph, (x, y) in zip(range(first, last), glyphs, positions):
+            self.surface.blit(glyph, (x, y))
+            self.advances[code] = glyph.get_width()
+            self.texcoords[code] = (
+                x / ATLAS_WIDTH,
+                y / atlas_height,
+                (x + glyph.get_width()) / ATLAS_WIDTH,
+                (y + height) / atlas_height,
+            )
+
+        self.texture_id = None
+
+    def encode(self, text):
+        codes = np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8)
+        return np.where(self.advances[codes] > 0, codes, ord("?"))
+
+    def measure(self, text):
+        return float(self.advances[self.encode(text)].sum())
+
+    def upload(self):
+        width, height = self.surface.get_size()
+        self.texture_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     pygame.image.tostring(self.surface, "RGBA", False))
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+
+class HUDText:
+    def __init__(self, atlas, text, x, y, max_width=None, line_height=30):
+        self.text = text
+        self.x = x
+        self.y = y
+
+        rows = wrap_text(atlas, text, max_width) if max_width else [text]
+        rows = rows or [""]
+        vertices = []
+        texcoords = []
+        for row_index, row in enumerate(rows):
+            codes = atlas.encode(row)
+            advances = atlas.advances[codes]
+            left = x + np.cumsum(advances) - advances
+            right = left + advances
+            top = np.full(len(codes), y + row_index * line_height, dtype=np.float32)
+            bottom = top + atlas.height
+
+            quad = np.empty((len(codes), 4, 2), dtype=np.float32)
+            quad[:, :, 0] = np.stack((left, right, right, left), axis=1)
+            quad[:, :, 1] = np.stack((top, top, bottom, bottom), axis=1)
+            vertices.append(quad)
+
+            u0, v0, u1, v1 = atlas.texcoords[codes].T
+            uv = np.empty((len(codes), 4, 2), dtype=np.float32)
+            uv[:, :, 0] = np.stack((u0, u1, u1, u0), axis=1)
+            uv[:, :, 1] = np.stack((v0, v0, v1, v1), axis=1)
+            texcoords.append(uv)
+
+        self.vertices = np.concatenate(vertices).reshape(-1, 2)
+        self.texcoords = np.concatenate(texcoords).reshape(-1, 2)
+
+class HUDCounter:
+    # A one-decimal number between a fixed prefix and suffix, laid out like a
+    # HUDText but into quads preallocated for the longest value; unused cells hold
+    # spaces. set() writes the digits and glyph positions in place through views
+    # made here, so a changing value builds no strings or arrays.
+    def __init__(self, atlas, prefix, suffix, x, y, digits=COUNTER_DIGITS):
+        self.atlas = atlas
+        self.x = float(x)
+        self.prefix = len(prefix)
+        self.suffix = tuple(atlas.encode(suffix).tolist())
+        self.limit = 10 ** (digits + 1) - 1  # in tenths
+        # Prefix, then room for the sign, digits, point, tenths and suffix (or "inf")
+        capacity = self.prefix + max(digits + 3, len(INFINITY_CODES)) + len(self.suffix)
+        self.codes = np.full(capacity, SPACE_CODE, dtype=np.intp)
+        self.codes[:self.prefix] = atlas.encode(prefix)
+        self.advances = np.zeros(capacity, dtype=np.float32)
+        self.lefts = np.zeros(capacity, dtype=np.float32)
+        self.rights = np.zeros(capacity, dtype=np.float32)
+        self.glyphs = np.zeros((capacity, 4), dtype=np.float32)
+        quads = np.zeros((capacity, 4, 2), dtype=np.float32)
+        quads[:, :2, 1] = y
+        quads[:, 2:, 1] = y + atlas.height
+        uvs = np.zeros((capacity, 4, 2), dtype=np.float32)
+        self.vertices = quads.reshape(-1, 2)
+        self.texcoords = uvs.reshape(-1, 2)
+        # Corner columns and the glyph values copied into them, in HUDText's corner order
+        u0, v0, u1, v1 = self.glyphs.T
+        self.copies = (
+            (quads[:, 0, 0], self.lefts), (quads[:, 1, 0], self.rights),
+            (quads[:, 2, 0], self.rights), (quads[:, 3, 0], self.lefts),
+            (uvs[:, 0, 0], u0), (uvs[:, 1, 0], u1), (uvs[:, 2, 0], u1), (uvs[:, 3, 0], u0),
+            (uvs[:, 0, 1], v0), (uvs[:, 1, 1], v0), (uvs[:, 2, 1], v1), (uvs[:, 3, 1], v1),
+        )
+        self.count = 0
+
+    def set(self, value):
+        codes = self.codes
+        end = self.prefix
+        if math.isfinite(value):
+            # Rounded to a tenth first, as the format spec does (9.95 shows as 9.9)
+            tenths = min(round(round(abs(value), 1) * 10), self.limit)
+            whole = tenths // 10
+            end += 3 + (value < 0)
+            remaining = whole
+            while remaining >= 10:
+                remaining //= 10
+                end += 1
+            # Written backwards from the tenths digit
+            codes[end - 1] = ZERO_CODE + tenths % 10
+            codes[end - 2] = POINT_CODE
+            position = end - 3
+            while True:
+                codes[position] = ZERO_CODE + whole % 10
+                whole //= 10
+                if not whole:
+                    break
+                position -= 1
+            if value < 0:
+                codes[position - 1] = MINUS_CODE
+        else:
+            for code in INFINITY_CODES:
+                codes[end] = code
+                end += 1
+        for code in self.suffix:
+            codes[end] = code
+            end += 1
+        self.count = end
+        while end < len(codes):
+            codes[end] = SPACE_CODE
+            end += 1
+        self.layout()
+
+    def layout(self):
+        # Array methods and the ufunc rather than np.take/np.cumsum, whose wrappers allocate per call
+        self.atlas.advances.take(self.codes, out=self.advances)
+        np.add.accumulate(self.advances, out=self.rights)
+        np.add(self.rights, self.x, out=self.rights)
+        np.subtract(self.rights, self.advances, out=self.lefts)
+        self.atlas.texcoords.take(self.codes, axis=0, out=self.glyphs)
+        for target, source in self.copies:
+            np.copyto(target, source)
+
+def wrap_text(atlas, text, max_width):
+    rows = []
+    line = []
+    for word in text.split():
+        line.append(word)
+        if atlas.measure(' '.join(line)) > max_width and len(line) > 1:
+            line.pop()
+            rows.append(' '.join(line))
+            line = [word]
+    if line:
+        rows.append(' '.join(line))
+    return rows
+
+class HUDRenderer:
+    def __init__(self, width, height, font_size=HUD_FONT_SIZE):
+        self.width = width
+        self.height = height
+        self.font = pygame.font.Font(None, font_size)
+        self.atlas = GlyphAtlas(self.font)
+        self.texts = {}
+        self.vertices = np.zeros((0, 2), dtype=np.float32)
+        self.texcoords = np.zeros((0, 2), dtype=np.float32)
+        self.dirty = True
+        # What update() last showed; its strings are only rebuilt when these change
+        self.shown_mass = None
+        self.shown_range = None
+        self.shown_stage = None
+        self.shown_countdown = None
+        self.countdown = HUDCounter(self.atlas, "Time until next stage: ", "s", 10, height - 50)
+
+    def set_text(self, key, text, x, y, max_width=None):
+        current = self.texts.get(key)
+        if current is not None and current.text == text and current.x == x and current.y == y:
+            return
+        self.texts[key] = HUDText(self.atlas, text, x, y, max_width)
+        self.dirty = True
+
+    def remove_text(self, key):
+        if self.texts.pop(key, None) is not None:
+            self.dirty = True
+
+    def update(self, stage, time_in_stage, speed_factor, mass_controller):
+        if mass_controller.current_mass != self.shown_mass or mass_controller.current_range != self.shown_range:
+            self.shown_mass = mass_controller.current_mass
+            self.shown_range = mass_controller.current_range
+            self.set_text("mass", f"Star Mass: {self.shown_mass:.2f} solar masses ({self.shown_range})", 10, 10)
+        if stage['name'] != self.shown_stage:
+            self.shown_stage = stage['name']
+            self.set_text("stage", f"Stage: {stage['name']}", 10, 50)
+            self.set_text("description", stage['description'], 10, 90, max_width=self.width - 20)
+
+        time_remaining = (stage['duration'] / 1000) / speed_factor - time_in_stage
+        # Compared in tenths of a second, the resolution it is displayed at (the final stage never ends)
+        countdown = round(time_remaining, 1)
+        if countdown != self.shown_countdown:
+            self.shown_countdown = countdown
+            self.countdown.set(time_remaining)
+
+    def rebuild(self):
+        texts = self.texts.values()
+        self.vertices = np.concatenate([text.vertices for text in texts] or [np.zeros((0, 2), dtype=np.float32)])
+        self.texcoords = np.concatenate([text.texcoords for text in texts] or [np.zeros((0, 2), dtype=np.float32)])
+        self.dirty = False
+
+    def draw(self):
+        if self.atlas.texture_id is None:
+            self.atlas.upload()
+        if self.dirty:
+            self.rebuild()
+        if len(self.vertices) == 0 and self.countdown.count == 0:
+            return
+
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_CURRENT_BIT)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.atlas.texture_id)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(1.0, 1.0, 1.0, 1.0)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, self.vertices)
+        glTexCoordPointer(2, GL_FLOAT, 0, self.texcoords)
+        glDrawArrays(GL_QUADS, 0, len(self.vertices))
+        # The countdown's quads are drawn from its own preallocated arrays
+        glVertexPointer(2, GL_FLOAT, 0, self.countdown.vertices)
+        glTexCoordPointer(2, GL_FLOAT, 0, self.countdown.texcoords)
+        glDrawArrays(GL_QUADS, 0, self.countdown.count * 4)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glPopAttrib()
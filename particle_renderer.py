@@ -0,0 +1,283 @@
+import ctypes
+import math
+from OpenGL.GL import *
+import numpy as np
+from shaders import PARTICLE_FRAGMENT_SHADER, PARTICLE_VERTEX_SHADER, ShaderProgram
+
+QUAD_CORNERS = np.array([(-1, -1), (1, -1), (1, 1), (-1, 1)], dtype=np.float32)
+QUAD_VERTEX_OFFSETS = np.arange(4, dtype=np.uint32)
+
+def draw_particle(position, size, color, rotation):
+    glPushMatrix()
+    glTranslatef(*position)
+    glRotatef(rotation, 0, 1, 0)
+
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    glDisable(GL_LIGHTING)
+    glColor4f(*color)
+
+    glBegin(GL_QUADS)
+    glVertex3f(-size, -size, 0)
+    glVertex3f(size, -size, 0)
+    glVertex3f(size, size, 0)
+    glVertex3f(-size, size, 0)
+    glEnd()
+
+    glEnable(GL_LIGHTING)
+    glDisable(GL_BLEND)
+    glPopMatrix()
+
+class ParticleBatch:
+    def __init__(self):
+        self.vertices = np.zeros((0, 4, 3), dtype=np.float32)
+        self.colors = np.zeros((0, 4, 4), dtype=np.float32)
+        self.vbo = None
+
+    def reserve(self, count):
+        if count > len(self.vertices):
+            self.vertices = np.zeros((count, 4, 3), dtype=np.float32)
+            self.colors = np.zeros((count, 4, 4), dtype=np.float32)
+
+    def build(self, positions, sizes, colors, rotations):
+        # Expand each particle into the four corners of its quad, rotated about
+        # the Y axis exactly like glRotatef(rotation, 0, 1, 0) in draw_particle.
+        count = len(sizes)
+        self.reserve(count)
+        radians = np.radians(rotations)
+        corner_x = QUAD_CORNERS[:, 0] * sizes[:, None]
+        corner_y = QUAD_CORNERS[:, 1] * sizes[:, None]
+
+        vertices = self.vertices[:count]
+        vertices[:, :, 0] = positions[:, 0, None] + corner_x * np.cos(radians)[:, None]
+        vertices[:, :, 1] = positions[:, 1, None] + corner_y
+        vertices[:, :, 2] = positions[:, 2, None] - corner_x * np.sin(radians)[:, None]
+        self.colors[:count] = colors[:, None, :]
+        return count
+
+    def upload(self, count):
+        vertices = self.vertices[:count]
+        colors = self.colors[:count]
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes + colors.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
+        glBufferSubData(GL_ARRAY_BUFFER, vertices.nbytes, colors.nbytes, colors)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glColorPointer(4, GL_FLOAT, 0, ctypes.c_void_p(vertices.nbytes))
+
+    def draw(self, positions, sizes, colors, rotations):
+        count = self.build(positions, sizes, colors, rotations)
+        if count == 0:
+            return
+
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        if bool(glGenBuffers):
+            self.upload(count)
+        else:
+            glVertexPointer(3, GL_FLOAT, 0, self.vertices[:count])
+            glColorPointer(4, GL_FLOAT, 0, self.colors[:count])
+
+        glDrawArrays(GL_QUADS, 0, count * 4)
+
+        if self.vbo is not None:
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glPopAttrib()
+
+# Per-vertex layout of the static shader particle buffer: (attribute, floats)
+SHADER_PARTICLE_ATTRIBUTES = (
+    ("center", 3),
+    ("corner", 2),
+    ("size", 1),
+    ("color", 4),
+    ("initial_rotation", 1),
+    ("rotation_speed", 1),
+)
+SHADER_PARTICLE_FLOATS = sum(components for _, components in SHADER_PARTICLE_ATTRIBUTES)
+
+class ShaderParticleBatch:
+    # Particle attributes sit in a static VBO that is rebuilt only when the
+    # ParticleSystem is respawned; each frame just sets the time uniform and the
+    # vertex shader does the rotation. The draw order's quad indices are kept in
+    # an element buffer, rewritten only when a different order array is passed.
+    def __init__(self, billboard=False):
+        self.billboard = billboard
+        self.shader = ShaderProgram("Particle", PARTICLE_VERTEX_SHADER, PARTICLE_FRAGMENT_SHADER,
+                                    [name for name, _ in SHADER_PARTICLE_ATTRIBUTES], ("time", "billboard"))
+        self.vbo = None
+        self.index_buffer = None
+        self.particles = None
+        self.version = None
+        self.count = 0
+        self.order = None
+        self.index_count = 0
+
+    def ready(self):
+        return self.shader.ready()
+
+    def upload(self, particles):
+        count = len(particles)
+        data = np.empty((count, 4, SHADER_PARTICLE_FLOATS), dtype=np.float32)
+        data[:, :, 0:3] = particles.positions[:, None, :]
+        data[:, :, 3:5] = QUAD_CORNERS
+        data[:, :, 5] = particles.sizes[:, None]
+        data[:, :, 6:10] = particles.colors[:, None, :]
+        data[:, :, 10] = particles.initial_rotations[:, None]
+        data[:, :, 11] = particles.rotation_speeds[:, None]
+
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.particles = particles
+        self.version = particles.version
+        self.count = count
+        self.order = None
+
+    def upload_order(self, order):
+        indices = (order.astype(np.uint32)[:, None] * 4 + QUAD_VERTEX_OFFSETS).ravel()
+        if self.index_buffer is None:
+            self.index_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.order = order
+        self.index_count = len(indices)
+
+    def draw(self, particles, time, order=None):
+        if self.particles is not particles or self.version != particles.version:
+            self.upload(particles)
+        if self.count == 0 or (order is not None and len(order) == 0):
+            return
+        if order is not None and order is not self.order:
+            self.upload_order(order)
+
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+
+        glUseProgram(self.shader.program)
+        glUniform1f(self.shader.uniforms["time"], time)
+        glUniform1i(self.shader.uniforms["billboard"], self.billboard)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        stride = SHADER_PARTICLE_FLOATS * 4
+        offset = 0
+        for location, (_, components) in enumerate(SHADER_PARTICLE_ATTRIBUTES):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, components, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset * 4))
+            offset += components
+
+        if order is None:
+            glDrawArrays(GL_QUADS, 0, self.count * 4)
+        else:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+            glDrawElements(GL_QUADS, self.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+        for location in range(len(SHADER_PARTICLE_ATTRIBUTES)):
+            glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+        glPopAttrib()
+
+class ParticleSorter:
+    # Back-to-front draw order with frustum culling for alpha-blended particles.
+    # The previous frame's order is re-sorted with a stable argsort (timsort),
+    # which runs in close to linear time when little has moved since last frame.
+    # Static particles pass their version, and then the visible order is reused
+    # (the same array is returned) until the version or either matrix changes.
+    def __init__(self):
+        self.order = np.zeros(0, dtype=np.intp)
+        self.key = None
+        self.visible = None
+
+    def sort(self, positions, sizes, modelview=None, projection=None, version=None):
+        # Matrices as returned by glGetFloatv: column-major, so rows of the numpy view are GL columns
+        if modelview is None:
+            modelview = glGetFloatv(GL_MODELVIEW_MATRIX)
+        if projection is None:
+            projection = glGetFloatv(GL_PROJECTION_MATRIX)
+        modelview = np.asarray(modelview, dtype=np.float32).reshape(4, 4)
+        projection = np.asarray(projection, dtype=np.float32).reshape(4, 4)
+        key = None if version is None else (version, modelview.tobytes(), projection.tobytes())
+        if key is not None and key == self.key:
+            return self.visible
+
+        eye = positions @ modelview[:3, :3] + modelview[3, :3]
+        depth = eye[:, 2]  # more negative is farther away
+        if len(self.order) != len(positions):
+            self.order = np.argsort(depth, kind="stable")
+        else:
+            self.order = self.order[np.argsort(depth[self.order], kind="stable")]
+
+        # Keep particles whose quad can reach the clip volume in x and y and that are in front of the camera
+        clip = eye @ projection[:3] + projection[3]
+        extent = sizes * np.float32(math.sqrt(2))
+        visible = clip[:, 3] > 0
+        visible &= np.abs(clip[:, 0]) <= clip[:, 3] + abs(projection[0, 0]) * extent
+        visible &= np.abs(clip[:, 1]) <= clip[:, 3] + abs(projection[1, 1]) * extent
+        self.key = key
+        self.visible = self.order[visible[self.order]]
+        return self.visible
+
+def draw_particles(particles, batch=None, lag=0.0, order=None):
+    positions, sizes, colors = particles.positions, particles.sizes, particles.colors
+    rotations = particles.interpolated_rotations(lag) if lag else particles.rotations
+    if order is not None:
+        positions, sizes, colors, rotations = positions[order], sizes[order], colors[order], rotations[order]
+    if batch is not None:
+        batch.draw(positions, sizes, colors, rotations)
+        return
+
+    for i in range(len(sizes)):
+        draw_particle(positions[i], sizes[i], colors[i], rotations[i])
+
+# Radius thresholds between point-size buckets for population rendering
+STAR_POINT_RADII = np.array([0.5, 1.5, 3.0], dtype=np.float32)
+STAR_POINT_SIZES = (1.0, 2.0, 3.0, 5.0)
+
+class StarPointBatch:
+    def __init__(self):
+        self.colors = np.zeros((0, 4), dtype=np.float32)
+
+    def draw(self, positions, colors, radii, emission):
+        count = len(radii)
+        if len(self.colors) != count:
+            self.colors = np.zeros((count, 4), dtype=np.float32)
+        np.multiply(colors, np.clip(0.4 + emission, 0, 1)[:, None], out=self.colors[:, :3])
+        np.greater(radii, 0, out=self.colors[:, 3], casting="unsafe")
+        buckets = np.digitize(radii, STAR_POINT_RADII)
+
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_POINT_BIT)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+        glEnable(GL_POINT_SMOOTH)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, positions)
+        glColorPointer(4, GL_FLOAT, 0, self.colors)
+        for bucket, size in enumerate(STAR_POINT_SIZES):
+            indices = np.flatnonzero(buckets == bucket).astype(np.uint32)
+            if len(indices):
+                glPointSize(size)
+                glDrawElements(GL_POINTS, len(indices), GL_UNSIGNED_INT, indices)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glPopAttrib()
@@ -0,0 +1,100 @@
+import numpy as np
+from simulation import EASING_CURVE, EASING_POSITIONS, MASS_GRID
+
+SALPETER_SLOPE = 2.35
+MASS_LIMITS = (0.08, 50.0)
+
+def sample_imf(count, rng, low=MASS_LIMITS[0], high=MASS_LIMITS[1], slope=SALPETER_SLOPE):
+    # Inverse-CDF sampling of a power-law initial mass function dN/dm ~ m^-slope
+    exponent = 1 - slope
+    low_term = low ** exponent
+    high_term = high ** exponent
+    return (low_term + rng.random(count) * (high_term - low_term)) ** (1 / exponent)
+
+def build_stage_tables(grid=MASS_GRID):
+    max_stages = grid.durations.shape[1]
+    tables = {
+        "grid": grid,
+        "max_stages": max_stages,
+        "durations": grid.durations.ravel(),
+        "transition_times": grid.transition_times.ravel(),
+        "colors": grid.colors.reshape(-1, 3).astype(np.float32),
+        "radii": grid.radii.ravel().astype(np.float32),
+        "emission": grid.emission.ravel().astype(np.float32),
+    }
+    return tables
+
+STAGE_TABLES = build_stage_tables()
+
+class StarPopulation:
+    def __init__(self, count, seed=0, cluster_radius=3.0, tables=STAGE_TABLES):
+        rng = np.random.default_rng(seed)
+        self.tables = tables
+        self.elapsed = 0.0
+
+        self.masses = sample_imf(count, rng)
+        self.grid_index = tables["grid"].rows_for_masses(self.masses).astype(np.int32)
+        self.positions = rng.normal(0.0, cluster_radius / 2, (count, 3)).astype(np.float32)
+
+        self.stage_index = np.zeros(count, dtype=np.int32)
+        self.is_transitioning = np.zeros(count, dtype=bool)
+        # Time spent in the current phase (stage or transition) and that phase's length
+        self.phase_timer = np.zeros(count)
+        self.phase_limit = np.zeros(count)
+
+        self.colors = np.zeros((count, 3), dtype=np.float32)
+        self.radii = np.zeros(count, dtype=np.float32)
+        self.emission = np.zeros(count, dtype=np.float32)
+
+        self.refresh(np.arange(count))
+
+    def __len__(self):
+        return len(self.masses)
+
+    def flat_stage_index(self, stars=slice(None)):
+        return self.grid_index[stars] * self.tables["max_stages"] + self.stage_index[stars]
+
+    def refresh(self, stars):
+        # Reload phase limits and steady-state appearance for stars whose phase changed
+        flat = self.flat_stage_index(stars)
+        transitioning = self.is_transitioning[stars]
+        self.phase_limit[stars] = np.where(
+            transitioning,
+            self.tables["transition_times"][flat],
+            self.tables["durations"][flat],
+        )
+        self.colors[stars] = self.tables["colors"][flat]
+        self.radii[stars] = self.tables["radii"][flat]
+        self.emission[stars] = self.tables["emission"][flat]
+
+    def step(self, delta_time):
+        self.elapsed += delta_time
+        self.phase_timer += delta_time
+
+        finished = np.flatnonzero(self.phase_timer >= self.phase_limit)
+        while len(finished):
+            self.phase_timer[finished] -= self.phase_limit[finished]
+            completing = self.is_transitioning[finished]
+            self.stage_index[finished[completing]] += 1
+            self.is_transitioning[finished] = ~completing
+            self.refresh(finished)
+            finished = finished[self.phase_timer[finished] >= self.phase_limit[finished]]
+
+        self.interpolate_transitions()
+
+    def interpolate_transitions(self):
+        stars = np.flatnonzero(self.is_transitioning)
+        if len(stars) == 0:
+            return
+
+        progress = np.minimum(1.0, self.phase_timer[stars] / self.phase_limit[stars])
+        # Same easing table as StageTimeline, so cluster stars and the single star match
+        eased = np.interp(progress, EASING_POSITIONS, EASING_CURVE).astype(np.float32)
+        current = self.flat_stage_index(stars)
+        following = current + 1
+
+        colors = self.tables["colors"]
+        self.colors[stars] = colors[current] + (colors[following] - colors[current]) * eased[:, None]
+        for key, values in (("radii", self.radii), ("emission", self.emission)):
+            table = self.tables[key]
+            values[stars] = table[current] + (table[following] - table[current]) * eased
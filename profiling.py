@@ -0,0 +1,53 @@
+import time
+import numpy as np
+
+FRAME_PHASES = ("events", "update", "starfield", "star", "particles", "hud", "flip")
+
+class FrameTimer:
+    # Per-phase frame timings (milliseconds) kept in a fixed-size ring buffer
+    def __init__(self, phases=FRAME_PHASES, capacity=600):
+        self.phases = phases
+        self.phase_index = {phase: index for index, phase in enumerate(phases)}
+        self.samples = np.zeros((capacity, len(phases)))
+        self.current = np.zeros(len(phases))
+        self.frame_count = 0
+        self.mark_time = time.perf_counter()
+
+    def begin_frame(self):
+        self.current[:] = 0
+        self.mark_time = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += (now - self.mark_time) * 1000
+        self.mark_time = now
+
+    def end_frame(self):
+        self.samples[self.frame_count % len(self.samples)] = self.current
+        self.frame_count += 1
+
+    def recent(self):
+        # Samples in chronological order, oldest first
+        capacity = len(self.samples)
+        if self.frame_count <= capacity:
+            return self.samples[:self.frame_count]
+        start = self.frame_count % capacity
+        return np.concatenate((self.samples[start:], self.samples[:start]))
+
+    def averages(self):
+        recent = self.recent()
+        return recent.mean(axis=0) if len(recent) else np.zeros(len(self.phases))
+
+    def summary_lines(self):
+        averages = self.averages()
+        lines = [f"{phase}: {value:.2f} ms" for phase, value in zip(self.phases, averages)]
+        lines.append(f"total: {averages.sum():.2f} ms")
+        return lines
+
+    def dump_csv(self, path):
+        recent = self.recent()
+        first_frame = self.frame_count - len(recent)
+        frames = np.arange(first_frame, self.frame_count)[:, None]
+        np.savetxt(path, np.hstack((frames, recent, recent.sum(axis=1, keepdims=True))),
+                   delimiter=",", fmt=["%d"] + ["%.4f"] * (len(self.phases) + 1),
+                   header=",".join(("frame",) + self.phases + ("total",)), comments="")
@@ -0,0 +1,145 @@
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+
+# GLSL 1.20 keeps these usable on Mesa's llvmpipe compatibility profile
+
+PARTICLE_VERTEX_SHADER = """
+#version 120
+uniform float time;
+uniform bool billboard;
+attribute vec3 center;
+attribute vec2 corner;
+attribute float size;
+attribute vec4 color;
+attribute float initial_rotation;
+attribute float rotation_speed;
+varying vec4 particle_color;
+
+void main() {
+    float angle = radians(mod(initial_rotation + rotation_speed * time, 360.0));
+    vec2 offset = corner * size;
+    if (billboard) {
+        // Spin in the screen plane around the particle's eye-space centre
+        vec4 eye = gl_ModelViewMatrix * vec4(center, 1.0);
+        eye.xy += vec2(offset.x * cos(angle) - offset.y * sin(angle), offset.x * sin(angle) + offset.y * cos(angle));
+        gl_Position = gl_ProjectionMatrix * eye;
+    } else {
+        // Same Y-axis rotation as glRotatef(rotation, 0, 1, 0) in draw_particle
+        vec3 position = center + vec3(offset.x * cos(angle), offset.y, -offset.x * sin(angle));
+        gl_Position = gl_ModelViewProjectionMatrix * vec4(position, 1.0);
+    }
+    particle_color = color;
+}
+"""
+
+PARTICLE_FRAGMENT_SHADER = """
+#version 120
+varying vec4 particle_color;
+
+void main() {
+    gl_FragColor = particle_color;
+}
+"""
+
+STAR_SURFACE_VERTEX_SHADER = """
+#version 120
+varying vec3 surface_position;
+varying vec3 eye_normal;
+varying vec3 eye_position;
+
+void main() {
+    surface_position = gl_Vertex.xyz;
+    eye_normal = gl_NormalMatrix * gl_Normal;
+    eye_position = (gl_ModelViewMatrix * gl_Vertex).xyz;
+    gl_Position = ftransform();
+}
+"""
+
+STAR_SURFACE_FRAGMENT_SHADER = """
+#version 120
+uniform vec3 base_color;
+uniform float brightness;
+uniform float time;
+uniform float granule_frequency;
+uniform float granulation;
+uniform float limb_darkening;
+uniform float flow_speed;
+varying vec3 surface_position;
+varying vec3 eye_normal;
+varying vec3 eye_position;
+
+float hash(vec3 p) {
+    p = fract(p * 0.3183099 + 0.1);
+    p *= 17.0;
+    return fract(p.x * p.y * p.z * (p.x + p.y + p.z));
+}
+
+// Value noise sampled on the unit sphere, so there is no texture seam
+float noise(vec3 p) {
+    vec3 i = floor(p);
+    vec3 f = fract(p);
+    f = f * f * (3.0 - 2.0 * f);
+    return mix(mix(mix(hash(i), hash(i + vec3(1.0, 0.0, 0.0)), f.x),
+                   mix(hash(i + vec3(0.0, 1.0, 0.0)), hash(i + vec3(1.0, 1.0, 0.0)), f.x), f.y),
+               mix(mix(hash(i + vec3(0.0, 0.0, 1.0)), hash(i + vec3(1.0, 0.0, 1.0)), f.x),
+                   mix(hash(i + vec3(0.0, 1.0, 1.0)), hash(i + vec3(1.0, 1.0, 1.0)), f.x), f.y), f.z);
+}
+
+void main() {
+    vec3 p = normalize(surface_position) * granule_frequency;
+    float drift = time * flow_speed;
+    float cells = 0.6 * noise(p + vec3(drift, 0.0, -drift))
+                + 0.3 * noise(p * 2.03 - vec3(0.0, drift * 1.7, 0.0))
+                + 0.1 * noise(p * 4.01 + vec3(drift * 2.3));
+    float granules = 1.0 + granulation * (cells - 0.5) * 2.0;
+
+    // Linear limb darkening law: I(mu) = 1 - u (1 - mu)
+    float mu = clamp(dot(normalize(eye_normal), normalize(-eye_position)), 0.0, 1.0);
+    float limb = 1.0 - limb_darkening * (1.0 - mu);
+    gl_FragColor = vec4(base_color * brightness * granules * limb, 1.0);
+}
+"""
+
+def shaders_supported():
+    return bool(glCreateShader) and bool(glUseProgram)
+
+def compile_program(vertex_source, fragment_source, attributes=()):
+    # attributes are bound to locations 0, 1, 2... in order; location 0 must be
+    # an attribute every vertex uses on compatibility profiles
+    program = glCreateProgram()
+    glAttachShader(program, shaders.compileShader(vertex_source, GL_VERTEX_SHADER))
+    glAttachShader(program, shaders.compileShader(fragment_source, GL_FRAGMENT_SHADER))
+    for location, name in enumerate(attributes):
+        glBindAttribLocation(program, location, name)
+    glLinkProgram(program)
+    if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+        raise RuntimeError(f"Shader link failed: {glGetProgramInfoLog(program)}")
+    return program
+
+def uniform_locations(program, names):
+    return {name: glGetUniformLocation(program, name) for name in names}
+
+class ShaderProgram:
+    # Compiled on first use so it can be created before a GL context exists;
+    # a failure is reported once and ready() stays False so callers fall back.
+    def __init__(self, name, vertex_source, fragment_source, attributes=(), uniforms=()):
+        self.name = name
+        self.vertex_source = vertex_source
+        self.fragment_source = fragment_source
+        self.attributes = attributes
+        self.uniform_names = uniforms
+        self.program = None
+        self.uniforms = {}
+        self.failed = False
+
+    def ready(self):
+        if self.program is None and not self.failed:
+            try:
+                if not shaders_supported():
+                    raise RuntimeError("GLSL shaders are not supported by this context")
+                self.program = compile_program(self.vertex_source, self.fragment_source, self.attributes)
+                self.uniforms = uniform_locations(self.program, self.uniform_names)
+            except Exception as e:
+                print(f"{self.name} shader unavailable, using the fixed-function path: {e}")
+                self.failed = True
+        return self.program is not None
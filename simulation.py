@@ -0,0 +1,865 @@
+import bisect
+import math
+import struct
+import zlib
+import numpy as np
+
+# Mass ranges and their corresponding evolutionary paths
+MASS_RANGES = {
+    "Very Low Mass": {
+        "range": (0.08, 0.4),  # Solar masses
+        "stages": [
+            {
+                "name": "Nebula",
+                "duration": 5000,
+                "color": (0.6, 0.4, 0.8),
+                "radius": 0.0,
+                "emission": 0.2,
+                "texture": "star_texture.jpg",
+                "description": "A vast cloud of gas and dust where stars form",
+                "transition_time": 1000,
+                "particle_count": 1000,
+                "particle_spread": 2.0
+            },
+            {
+                "name": "Brown Dwarf",
+                "duration": float('inf'),  # Final stage
+                "color": (0.8, 0.4, 0.2),
+                "radius": 0.3,
+                "emission": 0.1,
+                "texture": "NO-TEXTURE",
+                "description": "A failed star without enough mass to sustain nuclear fusion",
+                "transition_time": 0
+            }
+        ]
+    },
+    "Low Mass": {
+        "range": (0.4, 2.0),
+        "stages": [
+            {
+                "name": "Nebula",
+                "duration": 5000,
+                "color": (0.6, 0.4, 0.8),
+                "radius": 0.0,
+                "emission": 0.2,
+                "texture": "star_texture.jpg",
+                "description": "A vast cloud of gas and dust where stars form",
+                "transition_time": 1000,
+                "particle_count": 5000,
+                "particle_spread": 2.5
+            },
+            {
+                "name": "Protostar",
+                "duration": 3000,
+                "color": (1.0, 0.7, 0.3),
+                "radius": 0.8,
+                "emission": 0.5,
+                "texture": "star_texture.jpg",
+                "description": "An early stage as gravity pulls matter inward",
+                "transition_time": 1000
+            },
+            {
+                "name": "Main Sequence",
+                "duration": 8000,
+                "color": (1.0, 1.0, 0.8),
+                "radius": 1.0,
+                "emission": 0.8,
+                "texture": "star_texture.jpg",
+                "description": "The stable phase, powered by hydrogen fusion",
+                "transition_time": 1000
+            },
+            {
+                "name": "Red Giant",
+                "duration": 4000,
+                "color": (1.0, 0.2, 0.0),
+                "radius": 2.0,
+                "emission": 0.6,
+                "texture": "NO-TEXTURE",
+                "description": "An expanded phase as the core depletes hydrogen",
+                "transition_time": 1000
+            },
+            {
+                "name": "White Dwarf",
+                "duration": float('inf'),
+                "color": (0.9, 0.9, 1.0),
+                "radius": 0.5,
+                "emission": 0.4,
+                "texture": "NO-TEXTURE",
+                "description": "The final stage - a dense, cooling stellar remnant",
+                "transition_time": 0
+            }
+        ]
+    },
+    "Medium Mass": {
+        "range": (2.0, 8.0),
+        "stages": [
+            {
+                "name": "Nebula",
+                "duration": 4000,
+                "color": (0.6, 0.4, 0.8),
+                "radius": 0.0,
+                "emission": 0.2,
+                "texture": "star_texture.jpg",
+                "description": "A vast cloud of gas and dust where stars form",
+                "transition_time": 1000,
+                "particle_count": 10000,
+                "particle_spread": 3.0
+            },
+            {
+                "name": "Protostar",
+                "duration": 2000,
+                "color": (1.0, 0.8,  0.4),
+                "radius": 1.2,
+                "emission": 0.6,
+                "texture": "star_texture.jpg",
+                "description": "A rapidly contracting pre-stellar object",
+                "transition_time": 800
+            },
+            {
+                "name": "Main Sequence",
+                "duration": 6000,
+                "color": (1.0, 1.0, 1.0),
+                "radius": 1.5,
+                "emission": 1.0,
+                "texture": "star_texture.jpg",
+                "description": "A bright, massive star burning hydrogen",
+                "transition_time": 1000
+            },
+            {
+                "name": "Red Supergiant",
+                "duration": 3000,
+                "color": (1.0, 0.1, 0.0),
+                "radius": 3.0,
+                "emission": 0.7,
+                "texture": "NO-TEXTURE",
+                "description": "A huge, cool giant nearing the end of its life",
+                "transition_time": 1000
+            },
+            {
+                "name": "White Dwarf",
+                "duration": float('inf'),
+                "color": (1.0, 1.0, 1.0),
+                "radius": 0.6,
+                "emission": 0.5,
+                "texture": "NO-TEXTURE",
+                "description": "The exposed core after ejecting outer layers",
+                "transition_time": 0
+            }
+        ]
+    },
+    "High Mass": {
+        "range": (8.0, 50.0),
+        "stages": [
+            {
+                "name": "Nebula",
+                "duration": 3000,
+                "color": (0.6, 0.4, 0.8),
+                "radius": 0.0,
+                "emission": 0.2,
+                "texture": "star_texture.jpg",
+                "description": "A massive cloud of gas and dust",
+                "transition_time": 1000,
+                "particle_count": 15000,
+                "particle_spread": 3.5
+            },
+            {
+                "name": "Protostar",
+                "duration": 1500,
+                "color": (1.0, 0.9, 0.5),
+                "radius": 2.0,
+                "emission": 0.8,
+                "texture": "star_texture.jpg",
+                "description": "A rapidly evolving massive protostar",
+                "transition_time": 500
+            },
+            {
+                "name": "Main Sequence",
+                "duration": 4000,
+                "color": (0.8, 0.8, 1.0),
+                "radius": 2.5,
+                "emission": 1.2,
+                "texture": "star_texture.jpg",
+                "description": "A massive, bright, blue star",
+                "transition_time": 1000
+            },
+            {
+                "name": "Blue Supergiant",
+                "duration": 2000,
+                "color": (0.4, 0.4, 1.0),
+                "radius": 3.5,
+                "emission": 1.0,
+                "texture": "NO-TEXTURE",
+                "description": "An extremely luminous blue giant",
+                "transition_time": 800
+            },
+            {
+                "name": "Red Supergiant",
+                "duration": 1500,
+                "color": (1.0, 0.0, 0.0),
+                "radius": 4.0,
+                "emission": 0.8,
+                "texture": "NO-TEXTURE",
+                "description": "A massive red giant before supernova",
+                "transition_time": 500
+            },
+            {
+                "name": "Supernova",
+                "duration": 500,
+                "color": (1.0, 1.0, 0.0),
+                "radius": 5.0,
+                "emission": 2.0,
+                "texture": "NO-TEXTURE",
+                "description": "A massive explosion marking the star's death",
+                "transition_time": 200,
+                "particle_count": 2000,
+                "particle_spread": 6.0
+            },
+            {
+                "name": "Neutron Star",
+                "duration": float('inf'),
+                "color": (0.9, 0.9, 1.0),
+                "radius": 0.2,
+                "emission": 0.6,
+                "texture": "NO-TEXT",
+                "description": "A super-dense stellar remnant after supernova",
+                "transition_time": 0
+            }
+        ]
+    }
+}
+
+NEBULA_COLORS = np.array([
+    (0.6, 0.4, 0.8, 0.3),
+    (0.3, 0.4, 0.8, 0.3),
+    (0.8, 0.4, 0.6, 0.3),
+    (0.4, 0.6, 0.8, 0.3),
+], dtype=np.float32)
+
+def generate_particles(count, spread, rng):
+    angles = rng.uniform(0, 2 * math.pi, count)
+    radii = rng.uniform(0, spread, count)
+    positions = np.empty((count, 3), dtype=np.float32)
+    positions[:, 0] = np.cos(angles) * radii
+    positions[:, 1] = np.sin(angles) * radii
+    positions[:, 2] = rng.uniform(-spread / 2, spread / 2, count)
+    return {
+        "positions": positions,
+        "sizes": rng.uniform(0.02, 0.08, count).astype(np.float32),
+        "colors": NEBULA_COLORS[rng.integers(0, len(NEBULA_COLORS), count)],
+        "initial_rotations": rng.uniform(0, 360, count).astype(np.float32),
+        # Degrees per simulated second
+        "rotation_speeds": rng.uniform(-30, 30, count).astype(np.float32),
+    }
+
+class ParticleSystem:
+    # Particle arrays only change on spawn, assign or clear, which bump version;
+    # rotation is derived from age, so update() costs the same for any number of particles.
+    FIELDS = ("positions", "sizes", "colors", "initial_rotations", "rotation_speeds")
+
+    def __init__(self):
+        self.version = 0
+        self.clear()
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def spawn(self, count, spread, rng):
+        self.assign(generate_particles(count, spread, rng), spread)
+
+    def assign(self, cloud, spread):
+        # Cached clouds are read-only, so the system keeps its own copies
+        for name in self.FIELDS:
+            setattr(self, name, np.array(cloud[name]))
+        self.spread = spread
+        self.age = 0.0
+        self.version += 1
+
+    def clear(self):
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.sizes = np.zeros(0, dtype=np.float32)
+        self.colors = np.zeros((0, 4), dtype=np.float32)
+        self.initial_rotations = np.zeros(0, dtype=np.float32)
+        self.rotation_speeds = np.zeros(0, dtype=np.float32)
+        self.spread = 0.0
+        self.age = 0.0
+        self.version += 1
+
+    def update(self, delta_time):
+        self.age += delta_time
+
+    def rotations_at(self, age):
+        return np.mod(self.initial_rotations + self.rotation_speeds * age, 360)
+
+    @property
+    def rotations(self):
+        return self.rotations_at(self.age)
+
+    def interpolated_rotations(self, lag):
+        return self.rotations_at(self.age - lag)
+
+EJECTA_DRAG = 1.5  # per second
+EJECTA_LIFETIME = 6.0  # seconds; each particle fades out over 60-100% of this
+EJECTA_COOLING_RATE = 0.8  # per second
+EJECTA_HOT_COLOR = np.array((1.0, 0.95, 0.6), dtype=np.float32)
+EJECTA_COOL_COLOR = np.array((0.7, 0.15, 0.1), dtype=np.float32)
+
+CLOUD_CHUNK_SIZE = 4096
+cloud_cache = {}
+
+def cloud_entropy(seed, range_name, stage_name):
+    # zlib.crc32 rather than hash(), which is salted per process
+    return (seed, zlib.crc32(range_name.encode()), zlib.crc32(stage_name.encode()))
+
+def generate_cloud_chunk(count, spread, seed_sequence):
+    return generate_particles(count, spread, np.random.default_rng(seed_sequence))
+
+def generate_cloud(count, spread, entropy, executor=None, chunk_size=CLOUD_CHUNK_SIZE):
+    # Every chunk draws from its own child stream of the seed, so the cloud is
+    # identical whether the chunks run serially or across a process pool.
+    counts = [min(chunk_size, count - start) for start in range(0, count, chunk_size)] or [0]
+    streams = np.random.SeedSequence(entropy).spawn(len(counts))
+    spreads = [spread] * len(counts)
+    if executor is not None and len(counts) > 1:
+        chunks = list(executor.map(generate_cloud_chunk, counts, spreads, streams))
+    else:
+        chunks = list(map(generate_cloud_chunk, counts, spreads, streams))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in ParticleSystem.FIELDS}
+
+def get_cloud(range_name, stage_name, count, spread, seed=0, executor=None):
+    key = (range_name, stage_name, count, spread, seed)
+    if key not in cloud_cache:
+        cloud = generate_cloud(count, spread, cloud_entropy(seed, range_name, stage_name), executor)
+        for values in cloud.values():
+            values.setflags(write=False)
+        cloud_cache[key] = cloud
+    return cloud_cache[key]
+
+class EjectaSystem:
+    # Expanding supernova shell. Velocities decay exponentially under drag, so a
+    # particle launched at speed v coasts a distance v / drag before stopping.
+    def __init__(self, drag=EJECTA_DRAG, lifetime=EJECTA_LIFETIME, cooling_rate=EJECTA_COOLING_RATE):
+        self.drag = drag
+        self.lifetime = lifetime
+        self.cooling_rate = cooling_rate
+        self.clear()
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def spawn(self, count, spread, radius, rng):
+        # Particles start on a sphere of the given radius and travel 60-100% of spread outwards
+        directions = rng.normal(size=(count, 3))
+        directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), 1e-9)
+        speeds = rng.uniform(0.6, 1.0, count) * spread * self.drag
+
+        self.age = 0.0
+        self.positions = (directions * radius).astype(np.float32)
+        self.velocities = (directions * speeds[:, None]).astype(np.float32)
+        self.sizes = rng.uniform(0.03, 0.1, count).astype(np.float32)
+        self.rotations = rng.uniform(0, 360, count).astype(np.float32)
+        self.lifetimes = (rng.uniform(0.6, 1.0, count) * self.lifetime).astype(np.float32)
+        self.cooling_rates = (rng.uniform(0.7, 1.3, count) * self.cooling_rate).astype(np.float32)
+        self.colors = np.empty((count, 4), dtype=np.float32)
+        self.displacement = np.empty((count, 3), dtype=np.float32)
+        self.scratch = np.empty(count, dtype=np.float32)
+        self.update_colors()
+
+    def clear(self):
+        self.age = 0.0
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.velocities = np.zeros((0, 3), dtype=np.float32)
+        self.sizes = np.zeros(0, dtype=np.float32)
+        self.rotations = np.zeros(0, dtype=np.float32)
+        self.lifetimes = np.zeros(0, dtype=np.float32)
+        self.cooling_rates = np.zeros(0, dtype=np.float32)
+        self.colors = np.zeros((0, 4), dtype=np.float32)
+        self.displacement = np.zeros((0, 3), dtype=np.float32)
+        self.scratch = np.zeros(0, dtype=np.float32)
+
+    def update(self, delta_time):
+        if not len(self):
+            return
+        self.age += delta_time
+        if self.age >= self.lifetime:
+            self.clear()
+            return
+
+        # Exact solution of dv/dt = -drag * v over the step, so the shell follows
+        # the same path whatever the tick length
+        decay = math.exp(-self.drag * delta_time)
+        np.multiply(self.velocities, (1 - decay) / self.drag, out=self.displacement)
+        self.positions += self.displacement
+        self.velocities *= decay
+        self.update_colors()
+
+    def update_colors(self):
+        # Colour cools from hot to cool as exp(-rate * age); alpha falls linearly to zero at each lifetime
+        np.multiply(self.cooling_rates, -self.age, out=self.scratch)
+        np.exp(self.scratch, out=self.scratch)
+        np.multiply(self.scratch[:, None], EJECTA_HOT_COLOR - EJECTA_COOL_COLOR, out=self.colors[:, :3])
+        self.colors[:, :3] += EJECTA_COOL_COLOR
+        np.divide(self.age, self.lifetimes, out=self.scratch)
+        np.subtract(1, self.scratch, out=self.colors[:, 3])
+        np.clip(self.colors[:, 3], 0, 1, out=self.colors[:, 3])
+
+EASING_STEPS = 1024
+# Cosine ease-in-out, sampled once; ease() interpolates between neighbouring entries
+EASING_POSITIONS = np.linspace(0.0, 1.0, EASING_STEPS + 1)
+EASING_CURVE = (1 - np.cos(EASING_POSITIONS * math.pi)) / 2
+EASING_TABLE = EASING_CURVE.tolist()
+
+def ease(progress):
+    position = min(max(progress, 0.0), 1.0) * EASING_STEPS
+    index = min(int(position), EASING_STEPS - 1)
+    low = EASING_TABLE[index]
+    return low + (EASING_TABLE[index + 1] - low) * (position - index)
+
+class RenderState:
+    # The stage being shown and its (possibly mid-transition) appearance. One is
+    # allocated per consumer and rewritten in place, so stepping and drawing
+    # build no dicts or tuples per frame. stage is the stage dict, or during a
+    # transition the timeline's static transition entry (name, description, texture).
+    __slots__ = ("stage", "stage_index", "transitioning", "progress", "time_in_stage", "color", "radius", "emission")
+
+    def __init__(self):
+        self.stage = None
+        self.stage_index = 0
+        self.transitioning = False
+        self.progress = 0.0
+        self.time_in_stage = 0.0
+        self.color = np.zeros(3)
+        self.radius = 0.0
+        self.emission = 0.0
+
+class StageTimeline:
+    def __init__(self, stages):
+        self.stages = stages
+        self.durations = np.array([stage["duration"] for stage in stages], dtype=np.float64) / 1000
+        self.transition_times = np.array([stage["transition_time"] for stage in stages], dtype=np.float64) / 1000
+        self.colors = np.array([stage["color"] for stage in stages], dtype=np.float64)
+        self.radii = np.array([stage["radius"] for stage in stages], dtype=np.float64)
+        self.emission = np.array([stage.get("emission", 0.5) for stage in stages], dtype=np.float64)
+        self.particle_counts = np.array([stage.get("particle_count", 0) for stage in stages], dtype=np.int64)
+        self.particle_spreads = np.array([stage.get("particle_spread", 0.0) for stage in stages], dtype=np.float64)
+        # Particle clouds after the first stage are ejecta shells launched on entering the stage
+        self.ejecta_stages = [index for index, count in enumerate(self.particle_counts) if index > 0 and count]
+
+        self.color_deltas = np.diff(self.colors, axis=0)
+        self.radius_deltas = np.diff(self.radii)
+        self.emission_deltas = np.diff(self.emission)
+
+        # Each stage is a steady phase followed by its transition phase; phase_starts
+        # holds the simulated time at which each of those phases begins.
+        phases = np.column_stack((self.durations, self.transition_times)).ravel()
+        self.phase_starts = np.concatenate(([0.0], np.cumsum(phases)[:-1]))
+        self.stage_starts = self.phase_starts[0::2]
+        self.phase_start_list = self.phase_starts.tolist()
+
+        # Per-stage rows and Python floats for the scalar path, so writing a
+        # RenderState needs no fancy indexing or NumPy scalars
+        self.color_rows = list(self.colors)
+        self.color_delta_rows = list(self.color_deltas)
+        self.radius_list = self.radii.tolist()
+        self.radius_delta_list = self.radius_deltas.tolist()
+        self.emission_list = self.emission.tolist()
+        self.emission_delta_list = self.emission_deltas.tolist()
+        self.transition_time_list = self.transition_times.tolist()
+
+        self.transition_stages = [
+            {
+                "name": f"{current_stage['name']} -> {next_stage['name']}",
+                "duration": 1000,
+                "texture": current_stage["texture"],
+                "description": f"Transitioning from {current_stage['name']} to {next_stage['name']}"
+            }
+            for current_stage, next_stage in zip(stages, stages[1:])
+        ]
+
+    def __len__(self):
+        return len(self.stages)
+
+    def locate(self, time):
+        phase = bisect.bisect_right(self.phase_start_list, max(0.0, time)) - 1
+        stage_index, transitioning = divmod(phase, 2)
+        return stage_index, bool(transitioning), time - self.phase_start_list[phase]
+
+    def progress(self, stage_index, transition_timer):
+        transition_time = self.transition_time_list[stage_index]
+        return min(1.0, transition_timer / transition_time) if transition_time > 0 else 1.0
+
+    def sample(self, time, state):
+        stage_index, transitioning, offset = self.locate(max(0.0, time))
+        if transitioning:
+            return self.interpolate(stage_index, self.progress(stage_index, offset), state)
+        return self.steady(stage_index, offset, state)
+
+    def steady(self, stage_index, time_in_stage, state):
+        state.stage = self.stages[stage_index]
+        state.stage_index = stage_index
+        state.transitioning = False
+        state.progress = 0.0
+        state.time_in_stage = time_in_stage
+        state.color[:] = self.color_rows[stage_index]
+        state.radius = self.radius_list[stage_index]
+        state.emission = self.emission_list[stage_index]
+        return state
+
+    def interpolate(self, stage_index, progress, state):
+        eased = ease(progress)
+        state.stage = self.transition_stages[stage_index]
+        state.stage_index = stage_index
+        state.transitioning = True
+        state.progress = progress
+        state.time_in_stage = 0.0
+        np.multiply(self.color_delta_rows[stage_index], eased, out=state.color)
+        state.color += self.color_rows[stage_index]
+        state.radius = self.radius_list[stage_index] + self.radius_delta_list[stage_index] * eased
+        state.emission = self.emission_list[stage_index] + self.emission_delta_list[stage_index] * eased
+        return state
+
+    def sample_many(self, times):
+        # Vectorized sample(): stage index, transition flag and eased appearance at every time
+        times = np.maximum(times, 0.0)
+        phases = np.searchsorted(self.phase_starts, times, side="right") - 1
+        stage_index, transitioning = np.divmod(phases, 2)
+        transitioning = transitioning.astype(bool)
+        colors = self.colors[stage_index]
+        radii = self.radii[stage_index]
+        emission = self.emission[stage_index]
+
+        steps = stage_index[transitioning]
+        transition_times = self.transition_times[steps]
+        offsets = times[transitioning] - self.phase_starts[phases[transitioning]]
+        progress = np.minimum(1, offsets / np.where(transition_times > 0, transition_times, 1))
+        eased = np.interp(np.where(transition_times > 0, progress, 1), EASING_POSITIONS, EASING_CURVE)
+        colors[transitioning] += self.color_deltas[steps] * eased[:, None]
+        radii[transitioning] += self.radius_deltas[steps] * eased
+        emission[transitioning] += self.emission_deltas[steps] * eased
+        return stage_index, transitioning, colors, radii, emission
+
+
+STAGE_TIMELINES = {name: StageTimeline(mass_range["stages"]) for name, mass_range in MASS_RANGES.items()}
+
+MASS_GRID_SIZE = 1000
+
+class MassGrid:
+    # Log-spaced masses mapped to stage parameters. Stages that a band shares by
+    # name with its neighbour are interpolated linearly in log mass between the
+    # two bands' geometric centres, so parameters vary smoothly across band edges.
+    def __init__(self, size=MASS_GRID_SIZE, low=0.08, high=50.0, mass_ranges=MASS_RANGES):
+        self.range_names = list(mass_ranges)
+        self.upper_masses = [mass_range["range"][1] for mass_range in mass_ranges.values()]
+        self.log_low = math.log10(low)
+        self.log_step = (math.log10(high) - self.log_low) / (size - 1)
+        self.masses = np.logspace(self.log_low, math.log10(high), size)
+        self.range_index = np.searchsorted(self.upper_masses, self.masses)
+        bands = np.arange(len(self.range_names))
+        self.first_rows = np.searchsorted(self.range_index, bands, side="left")
+        self.last_rows = np.searchsorted(self.range_index, bands, side="right") - 1
+
+        timelines = [STAGE_TIMELINES[name] for name in self.range_names]
+        names = [[stage["name"] for stage in timeline.stages] for timeline in timelines]
+        centres = [math.log10(math.sqrt(low * high)) for low, high in (mass_range["range"] for mass_range in mass_ranges.values())]
+        max_stages = max(len(timeline) for timeline in timelines)
+
+        self.stage_counts = np.array([len(timelines[band]) for band in self.range_index])
+        self.durations = np.full((size, max_stages), np.inf)
+        self.transition_times = np.zeros((size, max_stages))
+        self.colors = np.zeros((size, max_stages, 3))
+        self.radii = np.zeros((size, max_stages))
+        self.emission = np.zeros((size, max_stages))
+        tables = ("durations", "transition_times", "colors", "radii", "emission")
+
+        for band, timeline in enumerate(timelines):
+            rows = np.flatnonzero(self.range_index == band)
+            count = len(timeline)
+            for table in tables:
+                getattr(self, table)[rows, :count] = getattr(timeline, table)
+
+            log_masses = np.log10(self.masses[rows])
+            for neighbour in (band - 1, band + 1):
+                if not 0 <= neighbour < len(timelines):
+                    continue
+                other = timelines[neighbour]
+                weights = np.clip((log_masses - centres[band]) / (centres[neighbour] - centres[band]), 0, 1)
+                blended = rows[weights > 0]
+                weights = weights[weights > 0]
+                for stage_index, name in enumerate(names[band]):
+                    if name not in names[neighbour]:
+                        continue
+                    other_index = names[neighbour].index(name)
+                    for table in tables:
+                        own = getattr(timeline, table)[stage_index]
+                        target = getattr(other, table)[other_index]
+                        if not np.all(np.isfinite(own) & np.isfinite(target)):
+                            continue
+                        weight = weights[:, None] if np.ndim(own) else weights
+                        getattr(self, table)[blended, stage_index] = own + (target - own) * weight
+
+        self.timelines = {}
+
+    def band_for_mass(self, mass):
+        return bisect.bisect_left(self.upper_masses, mass)
+
+    def row_for_mass(self, mass, band=None):
+        if band is None:
+            band = self.band_for_mass(mass)
+        row = round((math.log10(mass) - self.log_low) / self.log_step)
+        return min(max(row, self.first_rows[band]), self.last_rows[band])
+
+    def rows_for_masses(self, masses):
+        bands = np.searchsorted(self.upper_masses, masses)
+        rows = np.rint((np.log10(masses) - self.log_low) / self.log_step).astype(np.int64)
+        return np.clip(rows, self.first_rows[bands], self.last_rows[bands])
+
+    def timeline(self, row):
+        if row not in self.timelines:
+            stages = MASS_RANGES[self.range_names[self.range_index[row]]]["stages"]
+            self.timelines[row] = StageTimeline([
+                dict(
+                    stage,
+                    duration=float(self.durations[row, index] * 1000),
+                    transition_time=float(self.transition_times[row, index] * 1000),
+                    color=tuple(self.colors[row, index]),
+                    radius=float(self.radii[row, index]),
+                    emission=float(self.emission[row, index]),
+                )
+                for index, stage in enumerate(stages)
+            ])
+        return self.timelines[row]
+
+MASS_GRID = MassGrid()
+
+class MassController:
+    def __init__(self, grid=None):
+        self.grid = grid or MASS_GRID
+        self.current_mass = 1.0
+        self.current_range = "Low Mass"
+        self.grid_row = self.grid.row_for_mass(self.current_mass)
+        self.mass_change_speed = 0.1
+
+    def update_mass(self, delta):
+        old_range = self.current_range
+        self.current_mass = max(0.08, min(50.0, self.current_mass + delta * self.mass_change_speed))
+
+        band = self.grid.band_for_mass(self.current_mass)
+        self.current_range = self.grid.range_names[band]
+        self.grid_row = self.grid.row_for_mass(self.current_mass, band)
+
+        return self.current_range != old_range
+
+    def get_stages(self):
+        return self.get_timeline().stages
+
+    def get_timeline(self):
+        return self.grid.timeline(self.grid_row)
+
+# Snapshot layout: header, then the particle arrays and the ejecta arrays as raw
+# little-endian float32 in SNAPSHOT_PARTICLE_FIELDS / SNAPSHOT_EJECTA_FIELDS order.
+SNAPSHOT_MAGIC = b"STAR"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct("<4sHdddddi?ddIdIQ")
+SNAPSHOT_PARTICLE_FIELDS = (("positions", 3), ("sizes", 1), ("colors", 4), ("initial_rotations", 1), ("rotation_speeds", 1))
+SNAPSHOT_EJECTA_FIELDS = (("positions", 3), ("velocities", 3), ("sizes", 1), ("rotations", 1), ("lifetimes", 1), ("cooling_rates", 1))
+
+def pack_arrays(system, fields):
+    return b"".join(np.ascontiguousarray(getattr(system, name), dtype="<f4").tobytes() for name, _ in fields)
+
+def unpack_arrays(system, fields, count, data, offset):
+    for name, components in fields:
+        shape = (count, components) if components > 1 else (count,)
+        values = np.frombuffer(data, dtype="<f4", count=count * components, offset=offset).reshape(shape)
+        setattr(system, name, values.astype(np.float32))
+        offset += values.nbytes
+    return offset
+
+class StarSimulation:
+    # Particle clouds depend only on (mass range, stage, seed); executor is an
+    # optional process pool used to generate large clouds in chunks.
+    def __init__(self, mass_controller=None, seed=0, executor=None):
+        self.mass_controller = mass_controller or MassController()
+        self.seed = seed
+        self.executor = executor
+        self.current_stage_index = 0
+        self.next_stage_index = 1
+        self.stage_timer = 0
+        self.transition_timer = 0
+        self.is_transitioning = False
+        self.speed_factor = 1.0
+        self.elapsed = 0.0
+        self.particles = ParticleSystem()
+        self.ejecta = EjectaSystem()
+        self.state = RenderState()
+        self.initialize_particles()
+        self.update_state()
+
+    def initialize_particles(self):
+        timeline = self.mass_controller.get_timeline()
+        index = self.current_stage_index
+        count = timeline.particle_counts[index]
+        if count and index == 0:
+            spread = timeline.particle_spreads[index]
+            cloud = get_cloud(self.mass_controller.current_range, timeline.stages[index]["name"], count, spread,
+                              self.seed, self.executor)
+            self.particles.assign(cloud, spread)
+        else:
+            self.particles.clear()
+
+    def handle_mass_change(self):
+        self.current_stage_index = 0
+        self.next_stage_index = 1
+        self.stage_timer = 0
+        self.transition_timer = 0
+        self.is_transitioning = False
+        self.elapsed = 0.0
+        self.initialize_particles()
+        self.ejecta.clear()
+        self.update_state()
+
+    def change_mass(self, delta):
+        # Crossing a band restarts the life cycle; within a band the star keeps its
+        # age and is re-located on the timeline for its new mass.
+        timeline = self.mass_controller.get_timeline()
+        if self.mass_controller.update_mass(delta):
+            self.handle_mass_change()
+        elif self.mass_controller.get_timeline() is not timeline:
+            self.seek(self.elapsed)
+
+    def seek(self, time):
+        timeline = self.mass_controller.get_timeline()
+        stage_index, transitioning, offset = timeline.locate(time)
+        stage_changed = stage_index != self.current_stage_index
+
+        self.current_stage_index = stage_index
+        self.next_stage_index = stage_index + 1
+        self.is_transitioning = transitioning
+        self.stage_timer = timeline.durations[stage_index] if transitioning else offset
+        self.transition_timer = offset if transitioning else 0
+        self.elapsed = time
+        if stage_changed:
+            self.initialize_particles()
+        if len(self.particles):
+            # The cloud only turns while its stage is steady
+            self.particles.age = self.stage_timer
+        self.sync_ejecta(time)
+        self.update_state()
+
+    def seek_stage(self, stage_index):
+        timeline = self.mass_controller.get_timeline()
+        self.seek(timeline.stage_starts[max(0, min(len(timeline) - 1, stage_index))])
+
+    def launch_ejecta(self, stage_index):
+        timeline = self.mass_controller.get_timeline()
+        entropy = cloud_entropy(self.seed, self.mass_controller.current_range, timeline.stages[stage_index]["name"])
+        self.ejecta.spawn(timeline.particle_counts[stage_index], timeline.particle_spreads[stage_index],
+                          timeline.radii[stage_index], np.random.default_rng(entropy))
+
+    def sync_ejecta(self, time):
+        # Rebuild the shell a seek lands inside of; ejecta can only be advanced, not rewound
+        timeline = self.mass_controller.get_timeline()
+        for stage_index in timeline.ejecta_stages:
+            age = time - timeline.stage_starts[stage_index]
+            if 0 <= age < self.ejecta.lifetime:
+                if not len(self.ejecta) or age < self.ejecta.age:
+                    self.launch_ejecta(stage_index)
+                self.ejecta.update(age - self.ejecta.age)
+                return
+        self.ejecta.clear()
+
+    def step(self, delta_time):
+        # Time left over after a stage or transition ends carries into the next
+        # one, so large fixed steps land in the same state as many small ones.
+        timeline = self.mass_controller.get_timeline()
+        self.elapsed += delta_time
+
+        if not self.is_transitioning and timeline.particle_counts[self.current_stage_index]:
+            self.particles.update(delta_time)
+        self.ejecta.update(delta_time)
+
+        remaining = delta_time
+        launch_time = None
+        while True:
+            if not self.is_transitioning:
+                duration = timeline.durations[self.current_stage_index]
+                if self.stage_timer + remaining < duration:
+                    self.stage_timer += remaining
+                    break
+                remaining -= max(0, duration - self.stage_timer)
+                self.stage_timer = duration
+                self.is_transitioning = True
+                self.transition_timer = 0
+                self.next_stage_index = self.current_stage_index + 1
+            else:
+                transition_time = timeline.transition_times[self.current_stage_index]
+                if self.transition_timer + remaining < transition_time:
+                    self.transition_timer += remaining
+                    break
+                remaining -= transition_time - self.transition_timer
+                self.current_stage_index = self.next_stage_index
+                self.stage_timer = 0
+                self.transition_timer = 0
+                self.is_transitioning = False
+                if self.current_stage_index > 0:
+                    self.particles.clear()
+                if self.current_stage_index in timeline.ejecta_stages:
+                    self.launch_ejecta(self.current_stage_index)
+                    launch_time = self.elapsed - remaining
+
+        if launch_time is not None:
+            self.ejecta.update(self.elapsed - launch_time)
+        return self.update_state()
+
+    def snapshot(self):
+        particles = self.particles
+        ejecta = self.ejecta
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+            self.mass_controller.current_mass, self.elapsed, self.stage_timer, self.transition_timer, self.speed_factor,
+            self.current_stage_index, self.is_transitioning,
+            particles.spread, particles.age, len(particles), ejecta.age, len(ejecta), self.seed,
+        )
+        return header + pack_arrays(particles, SNAPSHOT_PARTICLE_FIELDS) + pack_arrays(ejecta, SNAPSHOT_EJECTA_FIELDS)
+
+    def restore(self, data):
+        (magic, version, mass, elapsed, stage_timer, transition_timer, speed_factor, stage_index, transitioning,
+         spread, particle_age, particle_count, ejecta_age, ejecta_count, seed) = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Not a star simulation snapshot")
+
+        self.mass_controller.current_mass = mass
+        self.mass_controller.update_mass(0)
+        self.seed = seed
+        self.elapsed = elapsed
+        self.stage_timer = stage_timer
+        self.transition_timer = transition_timer
+        self.speed_factor = speed_factor
+        self.current_stage_index = stage_index
+        self.next_stage_index = stage_index + 1
+        self.is_transitioning = transitioning
+
+        offset = unpack_arrays(self.particles, SNAPSHOT_PARTICLE_FIELDS, particle_count, data, SNAPSHOT_HEADER.size)
+        self.particles.spread = spread
+        self.particles.age = particle_age
+        self.particles.version += 1
+
+        ejecta = self.ejecta
+        unpack_arrays(ejecta, SNAPSHOT_EJECTA_FIELDS, ejecta_count, data, offset)
+        ejecta.age = ejecta_age
+        ejecta.colors = np.empty((ejecta_count, 4), dtype=np.float32)
+        ejecta.displacement = np.empty((ejecta_count, 3), dtype=np.float32)
+        ejecta.scratch = np.empty(ejecta_count, dtype=np.float32)
+        ejecta.update_colors()
+        self.update_state()
+
+    def get_transition_progress(self):
+        return self.mass_controller.get_timeline().progress(self.current_stage_index, self.transition_timer)
+
+    def update_state(self):
+        # Rewrites self.state from the stepped timers; returns it for convenience
+        timeline = self.mass_controller.get_timeline()
+        if self.is_transitioning:
+            return timeline.interpolate(self.current_stage_index, self.get_transition_progress(), self.state)
+        return timeline.steady(self.current_stage_index, self.stage_timer, self.state)
+
+    def sample_state(self, time, state):
+        return self.mass_controller.get_timeline().sample(time, state)
@@ -0,0 +1,293 @@
+from OpenGL.GL import *
+from OpenGL.GLU import *
+import numpy as np
+from particle_renderer import ParticleBatch, ParticleSorter, ShaderParticleBatch, StarPointBatch, draw_particles
+from shaders import STAR_SURFACE_FRAGMENT_SHADER, STAR_SURFACE_VERTEX_SHADER, ShaderProgram
+from simulation import RenderState, ease
+
+ZOOM_LEVELS = (-10.0, -5.0, -2.5)
+ZOOM_EASE_TIME = 0.35  # seconds
+PARTICLE_MODES = ("shader", "batched", "immediate")
+
+class StarLifeCycleRenderer:
+    def __init__(self, simulation, texture_manager=None):
+        self.simulation = simulation
+        self.texture_manager = texture_manager
+        self.particle_batch = ParticleBatch()
+        self.shader_particles = ShaderParticleBatch()
+        self.ejecta_batch = ParticleBatch()
+        self.particle_sorter = ParticleSorter()
+        self.ejecta_sorter = ParticleSorter()
+        self.particle_mode = PARTICLE_MODES[0]
+        self.sphere_cache = SphereMeshCache()
+        self.surface_shader = StarSurfaceShader()
+        self.procedural_surface = True
+        self.star_points = StarPointBatch()
+        self.state = RenderState()
+
+    def render(self, angle, zoom, lag=0.0):
+        self.render_star(angle, zoom, lag)
+        self.render_particles(lag)
+
+    def render_star(self, angle, zoom, lag=0.0):
+        # lag is how far behind the latest tick this frame is drawn, in simulated seconds
+        state = self.simulation.sample_state(self.simulation.elapsed - lag, self.state)
+
+        radius = state.radius
+        emission = state.emission
+        detail = select_sphere_detail(radius, zoom)
+
+        glPushMatrix()
+        glRotatef(angle, 0, 1, 0)
+        if self.uses_procedural_surface():
+            self.surface_shader.bind(state.color, emission, radius, self.simulation.elapsed - lag)
+            self.sphere_cache.draw_mesh(radius, detail)
+            self.surface_shader.unbind()
+        else:
+            texture_id = self.textures().get_texture(state.stage)
+            self.sphere_cache.draw(radius, state.color, emission, texture_id, detail)
+        glPopMatrix()
+
+    def uses_procedural_surface(self):
+        return self.procedural_surface and self.surface_shader.ready()
+
+    def textures(self):
+        # Created on first use, so the procedural surface never loads PIL or starts the decode pool
+        if self.texture_manager is None:
+            from textures import TextureManager
+            self.texture_manager = TextureManager()
+            self.texture_manager.preload_stages()
+        return self.texture_manager
+
+    def render_particles(self, lag=0.0):
+        particles = self.simulation.particles
+        if len(particles):
+            # The nebula is static and drawn outside the star's rotation, so its order
+            # only changes when it is respawned or the camera zooms
+            order = self.particle_sorter.sort(particles.positions, particles.sizes, version=particles.version)
+            if self.particle_mode == "shader" and self.shader_particles.ready():
+                self.shader_particles.draw(particles, particles.age - lag, order)
+            else:
+                draw_particles(particles, None if self.particle_mode == "immediate" else self.particle_batch, lag, order)
+
+        ejecta = self.simulation.ejecta
+        if len(ejecta):
+            order = self.ejecta_sorter.sort(ejecta.positions, ejecta.sizes)
+            self.ejecta_batch.draw(ejecta.positions[order], ejecta.sizes[order], ejecta.colors[order], ejecta.rotations[order])
+
+    def cycle_particle_mode(self):
+        self.particle_mode = PARTICLE_MODES[(PARTICLE_MODES.index(self.particle_mode) + 1) % len(PARTICLE_MODES)]
+
+    def render_population(self, population, angle):
+        glPushMatrix()
+        glRotatef(angle, 0, 1, 0)
+        self.star_points.draw(population.positions, population.colors, population.radii, population.emission)
+        glPopMatrix()
+
+# (largest apparent size, slices/stacks); apparent size is radius over camera distance
+SPHERE_DETAIL_LEVELS = (
+    (0.05, 16),
+    (0.12, 24),
+    (0.25, 40),
+    (float('inf'), 64),
+)
+SPHERE_SPECULAR = np.array([0.2, 0.2, 0.2, 1.0], dtype=np.float32)
+
+def select_sphere_detail(radius, zoom):
+    apparent_size = radius / abs(zoom)
+    for max_size, detail in SPHERE_DETAIL_LEVELS:
+        if apparent_size <= max_size:
+            return detail
+
+class SphereMeshCache:
+    def __init__(self):
+        self.display_lists = {}
+        self.ambient = np.ones(4, dtype=np.float32)
+        self.diffuse = np.ones(4, dtype=np.float32)
+        self.emission = np.ones(4, dtype=np.float32)
+
+    def get_display_list(self, detail):
+        if detail not in self.display_lists:
+            display_list = glGenLists(1)
+            quad = gluNewQuadric()
+            gluQuadricTexture(quad, GL_TRUE)
+            gluQuadricNormals(quad, GLU_SMOOTH)
+            glNewList(display_list, GL_COMPILE)
+            gluSphere(quad, 1.0, detail, detail)
+            glEndList()
+            gluDeleteQuadric(quad)
+            self.display_lists[detail] = display_list
+        return self.display_lists[detail]
+
+    def draw(self, radius, color, emission, texture_id, detail=64):
+        if radius <= 0:
+            return
+
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+
+        np.multiply(color, 0.1, out=self.ambient[:3])
+        np.multiply(color, 0.3, out=self.diffuse[:3])
+        np.multiply(color, emission, out=self.emission[:3])
+
+        glMaterialfv(GL_FRONT, GL_AMBIENT, self.ambient)
+        glMaterialfv(GL_FRONT, GL_DIFFUSE, self.diffuse)
+        glMaterialfv(GL_FRONT, GL_SPECULAR, SPHERE_SPECULAR)
+        glMaterialfv(GL_FRONT, GL_EMISSION, self.emission)
+        glMaterialf(GL_FRONT, GL_SHININESS, 10.0)
+
+        self.draw_mesh(radius, detail)
+        glDisable(GL_TEXTURE_2D)
+
+    def draw_mesh(self, radius, detail=64):
+        if radius <= 0:
+            return
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+        glEnable(GL_RESCALE_NORMAL)
+        glCallList(self.get_display_list(detail))
+        glDisable(GL_RESCALE_NORMAL)
+        glPopMatrix()
+
+SURFACE_UNIFORMS = ("brightness", "granule_frequency", "granulation", "limb_darkening", "flow_speed")
+
+class SurfaceParameters:
+    # Surface shader inputs derived from the stage parameters, rewritten in place
+    # every frame. Redder (cooler) stars get stronger granulation and limb
+    # darkening; larger stars get fewer, larger granules; brighter stars churn faster.
+    __slots__ = SURFACE_UNIFORMS
+
+    def __init__(self):
+        for name in SURFACE_UNIFORMS:
+            setattr(self, name, 0.0)
+
+    def update(self, color, emission, radius):
+        redness = min(1.0, max(0.0, color.item(0) - color.item(2)))
+        self.brightness = 0.2 + 0.8 * emission
+        self.granule_frequency = 3.0 + 8.0 / (1.0 + radius)
+        self.granulation = 0.2 + 0.3 * redness
+        self.limb_darkening = 0.45 + 0.3 * redness
+        self.flow_speed = 0.05 + 0.1 * emission
+        return self
+
+class StarSurfaceShader:
+    # Procedural photosphere replacing the sphere texture: animated noise
+    # granulation and limb darkening, all derived from the stage parameters
+    def __init__(self):
+        self.shader = ShaderProgram(
+            "Star surface", STAR_SURFACE_VERTEX_SHADER, STAR_SURFACE_FRAGMENT_SHADER,
+            uniforms=("base_color", "time") + SURFACE_UNIFORMS,
+        )
+        self.parameters = SurfaceParameters()
+
+    def ready(self):
+        return self.shader.ready()
+
+    def bind(self, color, emission, radius, time):
+        uniforms = self.shader.uniforms
+        glUseProgram(self.shader.program)
+        glUniform3f(uniforms["base_color"], *color)
+        glUniform1f(uniforms["time"], time)
+        parameters = self.parameters.update(color, emission, radius)
+        for name in SURFACE_UNIFORMS:
+            glUniform1f(uniforms[name], getattr(parameters, name))
+
+    def unbind(self):
+        glUseProgram(0)
+
+class CameraController:
+    def __init__(self, levels=ZOOM_LEVELS, level=1, ease_time=ZOOM_EASE_TIME):
+        self.levels = levels
+        self.level = level
+        self.zoom = self.start_zoom = self.target_zoom = levels[level]
+        self.ease_time = ease_time
+        self.ease_timer = ease_time
+
+    def set_level(self, level):
+        level = max(0, min(len(self.levels) - 1, level))
+        if level == self.level:
+            return
+        self.level = level
+        self.start_zoom = self.zoom
+        self.target_zoom = self.levels[level]
+        self.ease_timer = 0.0
+
+    def zoom_in(self):
+        self.set_level(self.level + 1)
+
+    def zoom_out(self):
+        self.set_level(self.level - 1)
+
+    def update(self, delta_time):
+        if self.ease_timer >= self.ease_time:
+            return
+        self.ease_timer = min(self.ease_time, self.ease_timer + delta_time)
+        self.zoom = self.start_zoom + (self.target_zoom - self.start_zoom) * ease(self.ease_timer / self.ease_time)
+
+    def apply(self):
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        glTranslatef(0.0, 0.0, self.zoom)
+
+def setup_scene(width, height, zoom):
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(45, (width / height), 0.1, 50.0)
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+    glEnable(GL_LIGHT0)
+    glLightfv(GL_LIGHT0, GL_POSITION, [0.0, 0.0, 2.0, 1.0])
+    glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.3, 0.3, 0.3, 1.0])
+    glLightModelfv(GL_LIGHT_MODEL_AMBIENT, [0.05, 0.05, 0.05, 1.0])
+
+    glTranslatef(0.0, 0.0, zoom)
+
+def draw_hud(hud, width, height):
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    glOrtho(0, width, height, 0, -1, 1)
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadIdentity()
+
+    glDisable(GL_DEPTH_TEST)
+    glDisable(GL_LIGHTING)
+
+    hud.draw()
+
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+    glPopMatrix()
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+
+def draw_frame(star_renderer, hud, angle, zoom, width, height, population=None, lag=0.0, timer=None, starfield=None):
+    glClearColor(0.0, 0.0, 0.02, 1.0)
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    if starfield is not None:
+        starfield.draw(angle, zoom)
+    if timer is not None:
+        timer.mark("starfield")
+
+    if population is not None:
+        star_renderer.render_population(population, angle)
+    else:
+        star_renderer.render_star(angle, zoom, lag)
+    if timer is not None:
+        timer.mark("star")
+
+    if population is None:
+        star_renderer.render_particles(lag)
+    if timer is not None:
+        timer.mark("particles")
+
+    if hud is not None:
+        draw_hud(hud, width, height)
+    if timer is not None:
+        timer.mark("hud")
@@ -0,0 +1,154 @@
+import ctypes
+import math
+import os
+from OpenGL.GL import *
+import numpy as np
+
+# About 3k stars in view at the default zoom, under 1 ms on llvmpipe; up to a million works
+STARFIELD_SIZE = int(os.environ.get("STAR_SIM_STARFIELD_SIZE", 100000))
+STARFIELD_RADIUS = 30.0  # inside the far plane from every zoom level
+STARFIELD_CELLS = 8  # chunks per cube-face edge, 6 * 8 * 8 chunks in all
+MAGNITUDE_RANGE = (-1.0, 8.0)
+# Limiting magnitude at the default zoom; closer zoom levels reveal fainter stars, down
+# to STARFIELD_MAX_LIMIT so the closest zoom level also stays under 1 ms
+STARFIELD_LIMIT = 6.9
+STARFIELD_MAX_LIMIT = 7.0
+STARFIELD_REFERENCE_ZOOM = 5.0
+MAGNITUDE_KEY_SCALE = 0.999  # keeps the magnitude part of a sort key below the next chunk index
+STAR_TINTS = np.array([
+    (0.65, 0.75, 1.0),
+    (0.85, 0.9, 1.0),
+    (1.0, 1.0, 1.0),
+    (1.0, 0.92, 0.75),
+    (1.0, 0.75, 0.55),
+], dtype=np.float32)
+STAR_TINT_WEIGHTS = (0.1, 0.2, 0.35, 0.25, 0.1)
+
+def sample_magnitudes(count, rng, low=MAGNITUDE_RANGE[0], high=MAGNITUDE_RANGE[1]):
+    # Star counts grow as 10^(0.6 m) for a uniform population, so most stars are faint
+    low_term = 10 ** (0.6 * low)
+    high_term = 10 ** (0.6 * high)
+    return np.clip(np.log10(low_term + rng.random(count) * (high_term - low_term)) / 0.6, low, high)
+
+def cube_cells(directions, cells):
+    # Index of the cube-face cell each unit direction falls in
+    axis = np.abs(directions).argmax(axis=1)
+    rows = np.arange(len(directions))
+    major = directions[rows, axis]
+    face = axis * 2 + (major < 0)
+    u = directions[rows, (axis + 1) % 3] / np.abs(major)
+    v = directions[rows, (axis + 2) % 3] / np.abs(major)
+    i = np.minimum(((u + 1) * 0.5 * cells).astype(np.intp), cells - 1)
+    j = np.minimum(((v + 1) * 0.5 * cells).astype(np.intp), cells - 1)
+    return (face * cells + i) * cells + j
+
+def limiting_magnitude(zoom):
+    return min(STARFIELD_MAX_LIMIT, STARFIELD_LIMIT + 2.5 * math.log10(STARFIELD_REFERENCE_ZOOM / abs(zoom)))
+
+def magnitude_key(magnitude, low=MAGNITUDE_RANGE[0], high=MAGNITUDE_RANGE[1]):
+    return (np.clip(magnitude, low, high) - low) / (high - low) * MAGNITUDE_KEY_SCALE
+
+def frustum_planes(modelview, projection):
+    # Matrices as returned by glGetFloatv; planes come out in the model space of modelview
+    combined = np.asarray(modelview, dtype=np.float64).reshape(4, 4) @ np.asarray(projection, dtype=np.float64).reshape(4, 4)
+    w = combined[:, 3]
+    planes = np.array([w + combined[:, 0], w - combined[:, 0], w + combined[:, 1],
+                       w - combined[:, 1], w + combined[:, 2], w - combined[:, 2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+class StarField:
+    # Background stars generated once from a seed and stored chunk by chunk in a
+    # single VBO. Each chunk is a cube-face cell of the sky with its stars sorted
+    # brightest first, so the level of detail for a limiting magnitude is a
+    # prefix of every chunk, and the visible chunks' prefixes are drawn with one
+    # glMultiDrawArrays.
+    def __init__(self, count=STARFIELD_SIZE, seed=0, radius=STARFIELD_RADIUS, cells=STARFIELD_CELLS):
+        rng = np.random.default_rng(seed)
+        directions = rng.standard_normal((count, 3))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        magnitudes = sample_magnitudes(count, rng)
+        tints = rng.choice(len(STAR_TINTS), count, p=STAR_TINT_WEIGHTS)
+
+        # Chunk index plus a magnitude fraction: sorted, these order stars by chunk and then
+        # brightness, and one searchsorted finds the LOD prefix of every chunk at once
+        chunk_ids = cube_cells(directions, cells)
+        keys = chunk_ids + magnitude_key(magnitudes)
+        order = np.argsort(keys)
+        self.keys = keys[order]
+        self.positions = (directions[order] * radius).astype(np.float32)
+        low, high = MAGNITUDE_RANGE
+        intensity = 1.0 - 0.85 * (magnitudes[order] - low) / (high - low)
+        self.colors = np.empty((count, 4), dtype=np.uint8)
+        self.colors[:, :3] = STAR_TINTS[tints[order]] * intensity[:, None] * 255
+        self.colors[:, 3] = 255
+
+        chunk_count = 6 * cells * cells
+        self.counts = np.bincount(chunk_ids, minlength=chunk_count)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int32)
+        # Bounding sphere of each chunk: centred on its mean position, reaching its farthest star
+        occupied = np.flatnonzero(self.counts)
+        self.centers = np.zeros((chunk_count, 3))
+        self.centers[occupied] = np.add.reduceat(self.positions, self.starts[occupied], dtype=np.float64)
+        self.centers /= np.maximum(self.counts, 1)[:, None]
+        distances = np.linalg.norm(self.positions - np.repeat(self.centers, self.counts, axis=0), axis=1)
+        self.radii = np.zeros(chunk_count)
+        self.radii[occupied] = np.maximum.reduceat(distances, self.starts[occupied])
+        self.vbo = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def upload(self):
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.positions.nbytes + self.colors.nbytes, None, GL_STATIC_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, self.positions.nbytes, self.positions)
+        glBufferSubData(GL_ARRAY_BUFFER, self.positions.nbytes, self.colors.nbytes, self.colors)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def visible_chunks(self, modelview=None, projection=None):
+        if modelview is None:
+            modelview = glGetFloatv(GL_MODELVIEW_MATRIX)
+        if projection is None:
+            projection = glGetFloatv(GL_PROJECTION_MATRIX)
+        planes = frustum_planes(modelview, projection)
+        distances = self.centers @ planes[:, :3].T + planes[:, 3]
+        return np.flatnonzero((self.counts > 0) & (distances >= -self.radii[:, None]).all(axis=1))
+
+    def chunk_ranges(self, chunks, limit):
+        # First star and star count of each chunk down to the limiting magnitude
+        firsts = self.starts[chunks]
+        ends = np.searchsorted(self.keys, chunks + magnitude_key(limit), side="right")
+        return firsts, (ends - firsts).astype(np.int32)
+
+    def draw(self, angle, zoom):
+        if self.vbo is None:
+            self.upload()
+
+        glPushMatrix()
+        glRotatef(angle, 0, 1, 0)
+        chunks = self.visible_chunks()
+        if len(chunks) == 0:
+            glPopMatrix()
+            return
+        firsts, counts = self.chunk_ranges(chunks, limiting_magnitude(zoom))
+
+        glPushAttrib(GL_ENABLE_BIT | GL_DEPTH_BUFFER_BIT | GL_POINT_BIT)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+        glDisable(GL_DEPTH_TEST)
+        glDepthMask(GL_FALSE)
+        glPointSize(1.0)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glColorPointer(4, GL_UNSIGNED_BYTE, 0, ctypes.c_void_p(self.positions.nbytes))
+        glMultiDrawArrays(GL_POINTS, firsts, counts, len(chunks))
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glPopAttrib()
+        glPopMatrix()
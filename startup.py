@@ -0,0 +1,34 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STARTUP_REPORT = bool(os.environ.get("STAR_SIM_STARTUP_REPORT"))
+
+class StartupProfiler:
+    # Wall-clock time of each import and initialization phase, measured from
+    # construction. Phases run on worker threads overlap the main thread's.
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+        self.first_frame = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            thread = threading.current_thread()
+            name = name if thread is threading.main_thread() else f"{name} [{thread.name}]"
+            self.phases.append((name, (start - self.start) * 1000, (time.perf_counter() - start) * 1000))
+
+    def finish(self):
+        if self.first_frame is None:
+            self.first_frame = (time.perf_counter() - self.start) * 1000
+
+    def report_lines(self):
+        lines = [f"{offset:8.1f} ms  {duration:8.1f} ms  {name}" for name, offset, duration in sorted(self.phases, key=lambda phase: phase[1])]
+        if self.first_frame is not None:
+            lines.append(f"first frame shown after {self.first_frame:.1f} ms")
+        return ["   start  duration  phase"] + lines
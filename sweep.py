@@ -0,0 +1,115 @@
+import argparse
+import math
+import os
+import struct
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import numpy as np
+
+SWEEP_CHUNK_SIZE = 500
+TIMELINE_TAIL = 2.0  # seconds sampled after the last stage begins
+
+def sweep_chunk(masses, times):
+    # Each mass uses the timeline of its grid row, so masses sharing a row are sampled once
+    from simulation import MASS_GRID
+    rows = MASS_GRID.rows_for_masses(masses)
+    shape = (len(masses), len(times))
+    stage = np.zeros(shape, dtype=np.int8)
+    transitioning = np.zeros(shape, dtype=bool)
+    color = np.zeros(shape + (3,), dtype=np.float32)
+    radius = np.zeros(shape, dtype=np.float32)
+    emission = np.zeros(shape, dtype=np.float32)
+    for row in np.unique(rows):
+        members = rows == row
+        stage_index, transition, colors, radii, emissions = MASS_GRID.timeline(row).sample_many(times)
+        stage[members] = stage_index
+        transitioning[members] = transition
+        color[members] = colors
+        radius[members] = radii
+        emission[members] = emissions
+    return stage, transitioning, color, radius, emission
+
+def run_sweep(masses, dt=0.1, duration=None, workers=None, chunk_size=SWEEP_CHUNK_SIZE):
+    from simulation import MASS_GRID, MASS_RANGES
+    masses = np.asarray(masses, dtype=np.float64)
+    rows = MASS_GRID.rows_for_masses(masses)
+    if duration is None:
+        duration = max(MASS_GRID.timeline(row).stage_starts[-1] for row in np.unique(rows)) + TIMELINE_TAIL
+    times = np.arange(0.0, duration, dt)
+
+    stage_names = np.array([[stage["name"] for stage in mass_range["stages"]] +
+                            [""] * (MASS_GRID.durations.shape[1] - len(mass_range["stages"]))
+                            for mass_range in MASS_RANGES.values()])
+    result = {
+        "masses": masses,
+        "times": times.astype(np.float32),
+        "range_index": MASS_GRID.range_index[rows].astype(np.int8),
+        "range_names": np.array(MASS_GRID.range_names),
+        "stage_names": stage_names,
+        "stage": np.zeros((len(masses), len(times)), dtype=np.int8),
+        "transitioning": np.zeros((len(masses), len(times)), dtype=bool),
+        "color": np.zeros((len(masses), len(times), 3), dtype=np.float32),
+        "radius": np.zeros((len(masses), len(times)), dtype=np.float32),
+        "emission": np.zeros((len(masses), len(times)), dtype=np.float32),
+    }
+
+    starts = range(0, len(masses), chunk_size)
+    chunks = [masses[start:start + chunk_size] for start in starts]
+    parallel = workers != 1 and len(chunks) > 1
+    with ProcessPoolExecutor(workers) if parallel else nullcontext() as executor:
+        outputs = (executor.map if parallel else map)(sweep_chunk, chunks, [times] * len(chunks))
+        for start, output in zip(starts, outputs):
+            for name, values in zip(("stage", "transitioning", "color", "radius", "emission"), output):
+                result[name][start:start + len(values)] = values
+    return result
+
+def save_sweep(path, result):
+    # Uncompressed npz: every column is stored as-is, so load_sweep can map it in place
+    np.savez(path, **result)
+
+def load_sweep(path):
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as sweep_file:
+        for info in archive.infolist():
+            # Local file header is 30 bytes plus the name and extra field
+            sweep_file.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", sweep_file.read(4))
+            sweep_file.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(sweep_file)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(sweep_file)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject or 0 in shape:
+                columns[name] = np.load(path)[name]
+            else:
+                columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=sweep_file.tell(),
+                                          shape=shape, order="F" if fortran_order else "C")
+    return columns
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the life cycle for many masses and write a columnar timeline file.")
+    masses = parser.add_mutually_exclusive_group(required=True)
+    masses.add_argument("--masses", type=float, nargs="+", help="explicit masses in solar masses")
+    masses.add_argument("--range", type=float, nargs=3, metavar=("LOW", "HIGH", "COUNT"),
+                        help="COUNT log-spaced masses from LOW to HIGH")
+    parser.add_argument("--dt", type=float, default=0.1, help="simulated seconds between samples")
+    parser.add_argument("--duration", type=float, default=None, help="simulated seconds to cover (default: every life cycle)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="sweep.npz")
+    args = parser.parse_args()
+
+    if args.masses:
+        mass_values = np.array(args.masses)
+    else:
+        low, high, count = args.range
+        mass_values = np.logspace(math.log10(low), math.log10(high), int(count))
+    mass_values = np.clip(mass_values, 0.08, 50.0)
+
+    result = run_sweep(mass_values, args.dt, args.duration, args.workers)
+    save_sweep(args.out, result)
+    print(f"Wrote {len(mass_values)} masses x {len(result['times'])} samples to {args.out} "
+          f"({os.path.getsize(args.out) / 1048576:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from OpenGL.GL import *
+from PIL import Image
+import numpy as np
+from simulation import MASS_RANGES
+
+CACHE_DIR = os.environ.get("STAR_SIM_CACHE_DIR")
+TEXTURE_CACHE_DIR = CACHE_DIR or os.path.join(os.path.expanduser("~"), ".cache", "star-simulation")
+TEXTURE_CACHE_VERSION = b"mip-rgba8-1"
+TEXTURE_LOADER_WORKERS = 2
+TEXTURE_BUDGET_BYTES = int(os.environ.get("STAR_SIM_TEXTURE_BUDGET_MB", 64)) * 1024 * 1024
+# Largest mip level kept in GPU memory (0 keeps full size) and whether to let the driver compress
+TEXTURE_MAX_SIZE = int(os.environ.get("STAR_SIM_TEXTURE_MAX_SIZE", 0)) or None
+TEXTURE_COMPRESSED = bool(os.environ.get("STAR_SIM_TEXTURE_COMPRESSED"))
+# Resource key shared by every stage whose texture file is missing or fails to load
+LIGHT_MAP_KEY = "<light map>"
+light_map_cache = {}
+
+def generate_light_map(size=256, seed=0, cache_dir=None):
+    key = (size, seed)
+    if key in light_map_cache:
+        return light_map_cache[key]
+
+    cache_dir = cache_dir or CACHE_DIR
+    cache_path = os.path.join(cache_dir, f"light_map_{size}_{seed}.npy") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        texture = np.load(cache_path)
+    else:
+        rng = np.random.default_rng(seed)
+        x = np.arange(size)[:, None]
+        y = np.arange(size)[None, :]
+        height = (np.sin(x / 20.0) * np.cos(y / 25.0) * 0.3 + 0.7) + rng.random((size, size)) * 0.1
+        brightness = (np.clip(height, 0, 1) * 255).astype(np.uint8)
+
+        texture = np.empty((size, size, 4), dtype=np.uint8)
+        texture[:, :, :3] = brightness[:, :, None]
+        texture[:, :, 3] = 255
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(cache_path, texture)
+
+    texture.setflags(write=False)
+    light_map_cache[key] = texture
+    return texture
+
+def mip_shapes(width, height):
+    shapes = [(height, width)]
+    while width > 1 or height > 1:
+        width = max(1, width // 2)
+        height = max(1, height // 2)
+        shapes.append((height, width))
+    return shapes
+
+def build_mip_chain(pixels):
+    levels = [pixels]
+    image = Image.fromarray(pixels)
+    for height, width in mip_shapes(pixels.shape[1], pixels.shape[0])[1:]:
+        image = image.resize((width, height), Image.BOX)
+        levels.append(np.asarray(image))
+    return levels
+
+# Cache blobs are flat uint8 .npy files: an 8-byte (width, height) header followed
+# by every mip level, largest first, so a memory-mapped load needs no parsing.
+def pack_mip_chain(levels):
+    height, width = levels[0].shape[:2]
+    header = np.array([width, height], dtype=np.uint32).view(np.uint8)
+    return np.concatenate([header] + [level.ravel() for level in levels])
+
+def unpack_mip_chain(blob):
+    width, height = blob[:8].view(np.uint32)
+    levels = []
+    offset = 8
+    for level_height, level_width in mip_shapes(int(width), int(height)):
+        size = level_height * level_width * 4
+        levels.append(blob[offset:offset + size].reshape(level_height, level_width, 4))
+        offset += size
+    return levels
+
+def decode_texture(image_path, cache_dir=TEXTURE_CACHE_DIR):
+    # Runs on a worker thread: no GL calls allowed here
+    if image_path == LIGHT_MAP_KEY or not os.path.exists(image_path):
+        return build_mip_chain(generate_light_map())
+
+    with open(image_path, "rb") as image_file:
+        content = image_file.read()
+    digest = hashlib.sha1(TEXTURE_CACHE_VERSION + content).hexdigest()
+    cache_path = os.path.join(cache_dir, f"texture_{digest}.npy") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        return unpack_mip_chain(np.load(cache_path, mmap_mode="r"))
+
+    image = Image.open(image_path).transpose(Image.FLIP_TOP_BOTTOM)
+    levels = build_mip_chain(np.asarray(image.convert("RGBA")))
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as cache_file:
+            np.save(cache_file, pack_mip_chain(levels))
+        os.replace(temporary_path, cache_path)
+    return levels
+
+def upload_texture(levels, max_size=None, compressed=False):
+    # Returns the texture id and its approximate size in GPU memory
+    if max_size:
+        levels = [level for level in levels if max(level.shape[:2]) <= max_size] or levels[-1:]
+    internal_format = GL_COMPRESSED_RGBA if compressed else GL_RGBA
+
+    texture_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture_id)
+    size = 0
+    for level, pixels in enumerate(levels):
+        height, width = pixels.shape[:2]
+        glTexImage2D(GL_TEXTURE_2D, level, internal_format, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     np.ascontiguousarray(pixels))
+        if compressed and glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED):
+            size += glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED_IMAGE_SIZE)
+        else:
+            size += pixels.nbytes
+
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    return texture_id, size
+
+class TextureManager:
+    # Decoding runs on a thread pool; uploads happen on the thread that owns the
+    # GL context, either in pump() or when get_texture() needs a texture now.
+    # Resident textures are kept in least-recently-used order and the oldest are
+    # deleted once their combined size exceeds budget_bytes.
+    def __init__(self, workers=TEXTURE_LOADER_WORKERS, cache_dir=TEXTURE_CACHE_DIR,
+                 budget_bytes=TEXTURE_BUDGET_BYTES, max_size=TEXTURE_MAX_SIZE, compressed=TEXTURE_COMPRESSED):
+        self.textures = OrderedDict()
+        self.texture_bytes = {}
+        self.resident_bytes = 0
+        self.aliases = {}
+        self.pending = {}
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.max_size = max_size
+        self.compressed = compressed
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="texture-decode")
+
+    def resolve(self, image_path):
+        if image_path not in self.aliases:
+            self.aliases[image_path] = image_path if os.path.exists(image_path) else LIGHT_MAP_KEY
+        return self.aliases[image_path]
+
+    def preload(self, image_paths):
+        for image_path in image_paths:
+            key = self.resolve(image_path)
+            if key not in self.textures and key not in self.pending:
+                self.pending[key] = self.pool.submit(decode_texture, key, self.cache_dir)
+
+    def preload_stages(self, mass_ranges=MASS_RANGES):
+        self.preload(sorted({stage["texture"] for range_data in mass_ranges.values() for stage in range_data["stages"]}))
+
+    def finish(self, key):
+        future = self.pending.pop(key)
+        try:
+            texture_id, size = upload_texture(future.result(), self.max_size, self.compressed)
+        except Exception as e:
+            if key == LIGHT_MAP_KEY:
+                raise
+            print(f"Error loading texture {key}: {e}")
+            for image_path, alias in self.aliases.items():
+                if alias == key:
+                    self.aliases[image_path] = LIGHT_MAP_KEY
+            self.preload([LIGHT_MAP_KEY])
+            if LIGHT_MAP_KEY in self.pending:
+                self.finish(LIGHT_MAP_KEY)
+            return
+
+        self.textures[key] = texture_id
+        self.texture_bytes[key] = size
+        self.resident_bytes += size
+        while self.resident_bytes > self.budget_bytes and len(self.textures) > 1:
+            self.evict(next(iter(self.textures)))
+
+    def evict(self, key):
+        glDeleteTextures([self.textures.pop(key)])
+        self.resident_bytes -= self.texture_bytes.pop(key)
+        self.evictions += 1
+
+    def pump(self, max_uploads=1):
+        # Upload at most max_uploads finished decodes, so one frame never pays for all of them
+        ready = [key for key, future in self.pending.items() if future.done()]
+        for key in ready[:max_uploads]:
+            self.finish(key)
+        return len(self.pending)
+
+    def get_texture(self, stage):
+        key = self.resolve(stage["texture"])
+        if key in self.textures:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return self.textures[key]
+
+        self.misses += 1
+        self.preload([key])
+        self.finish(key)
+        return self.textures[self.resolve(key)]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "resident": len(self.textures),
+            "resident_bytes": self.resident_bytes,
+            "budget_bytes": self.budget_bytes,
+        }
+
+    def summary_line(self):
+        return (f"Textures: {len(self.textures)} ({self.resident_bytes / 1048576:.1f} MB), "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evicted")